@@ -1,148 +1,189 @@
-import random
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import instrumentation
 from sudoku import SudokuBoard
+from propagation import propagate_board
+from units import geometry, size_of_cells, count_violations
 
-def ant_colony_optimization(board_string, num_ants=10, num_iterations=100, alpha=1, beta=2, evaporation_rate=0.5):
-    
-    board = SudokuBoard(board_string)
-    initial_board = board.get_board()
-    pheromone = {}
-
-   # Initialize pheromone levels
-    for row in range(9):
-        for col in range(9):
-            if initial_board[row][col] == 0:
-                for num in range(1, 10):
-                    if board.is_valid(row, col, num):
-                        pheromone[(row, col, num)] = 1
-
-    def calculate_heuristic(row, col, num):
-        """
-        The function calculates a heuristic value based on the number of empty cells that can be filled
-        with a given number in the same row, column, and 3x3 box in a Sudoku board.
-        
-        :param row: The `row` parameter in the `calculate_heuristic` function represents the index of
-        the row in the Sudoku board where you want to calculate the heuristic value. It is used to
-        determine the number of empty cells that can be filled with a specific number (`num`) in the
-        same row, column,
-        :param col: The `col` parameter in the `calculate_heuristic` function represents the column
-        index of the Sudoku board where you want to calculate the heuristic value for a given number
-        `num`. The function calculates the heuristic by counting the number of empty cells in the same
-        row, column, and 3x3
-        :param num: The `num` parameter in the `calculate_heuristic` function represents the number that
-        we are trying to place in the Sudoku puzzle. The heuristic function calculates the number of
-        empty cells in the same row, column, and 3x3 box where this number can potentially be placed
-        without violating the Sudoku
-        :return: The function `calculate_heuristic` returns the count of empty cells that can be filled
-        with the number `num` in the same row, column, and 3x3 box as the given cell at position `(row,
-        col)`.
-        """
-        # Heuristic: Number of empty cells that can be filled with 'num' in the same row, column, and box
-        count = 1
-        # Check row
-        for j in range(9):
-            if board.is_valid(row, j, num):
-                count += 1
-        # Check column
-        for i in range(9):
-            if board.is_valid(i, col, num):
-                count += 1
-        # Check 3x3 box
-        start_row = row - row % 3
-        start_col = col - col % 3
-        for i in range(3):
-            for j in range(3):
-                if board.is_valid(start_row + i, start_col + j, num):
-                    count += 1
-        return count
-
-    def ant_solution(board):
-        """
-        The function implements an ant colony optimization algorithm to solve a Sudoku puzzle by
-        iteratively updating pheromone levels and selecting numbers for empty cells based on
-        probabilities.
-        
-        :param board: It seems like the code snippet you provided is part of an Ant Colony Optimization
-        algorithm to solve a Sudoku puzzle. The `board` parameter is likely an object that represents
-        the Sudoku puzzle and contains methods like `is_valid(row, col, num)` to check if placing a
-        number at a specific position is
-        :return: a SudokuBoard object that represents the best solution found by the ant colony
-        optimization algorithm for solving a Sudoku puzzle. If no valid solution is found, it returns
-        None.
-        """
-        new_board = [[initial_board[i][j] for j in range(9)] for i in range(9)]
-        
-        for row in range(9):
-            for col in range(9):
-                if new_board[row][col] == 0:
-                    probabilities = {}
-                    total_probability = 0
-                    for num in range(1, 10):
-                        if board.is_valid(row, col, num):
-                            heuristic = calculate_heuristic(row, col, num)
-                            probabilities[num] = (pheromone[(row, col, num)] ** alpha) * (heuristic ** beta)
-                            total_probability += probabilities[num]
-
-                    if total_probability == 0:
-                        continue  # No valid moves, try next cell
-
-                    # Choose a number based on probabilities
-                    random_value = random.uniform(0, total_probability)
-                    cumulative_probability = 0
-                    for num, probability in probabilities.items():
-                        cumulative_probability += probability
-                        if random_value <= cumulative_probability:
-                            new_board[row][col] = num
-                            break
-        return new_board
+# Pheromone never evaporates below this, so every allowed digit stays reachable
+MIN_PHEROMONE = 1e-6
+
+
+def valid_digits(cells):
+    # (cells, size) bool: digit d + 1 is in none of the cell's units, i.e. SudokuBoard.is_valid for every cell and digit
+    grid = geometry(size_of_cells(len(cells)))
+    values = np.frombuffer(bytes(cells), dtype=np.uint8)
+    num_units = len(grid.units)
+    present = np.zeros((num_units, grid.size + 1), dtype=bool)
+    present[np.arange(num_units)[:, None], values[grid.unit_index]] = True
+    return ~present[grid.cell_unit_index].any(axis=1)[:, 1:]
+
+
+def calculate_heuristic(valid):
+    # 1 + number of cells in the same row, column and box where the digit is still valid.
+    # The starting board never changes, so this is computed once per run.
+    grid = geometry(size_of_cells(len(valid)))
+    unit_counts = valid[grid.unit_index].sum(axis=1)
+    return 1.0 + unit_counts[grid.cell_unit_index].sum(axis=1)
+
+
+def _place(cells, mask, peer_index, index, digit):
+    # Fill a cell and strike the digit from its peers; peers forced down to a
+    # single option are filled straight away (a cell left with none stays empty)
+    stack = [(index, digit)]
+    while stack:
+        index, digit = stack.pop()
+        if cells[index] or not mask[index, digit]:
+            continue
+        cells[index] = digit + 1
+        mask[index] = False
+        peers = peer_index[index]
+        hit = peers[mask[peers, digit]]
+        mask[hit, digit] = False
+        for peer in hit[mask[hit].sum(axis=1) == 1]:
+            stack.append((peer, int(mask[peer].argmax())))
+
+
+def construct_ant(start_cells, allowed, weights, rng):
+    # One ant walks the open cells from a random starting cell, picks each digit with
+    # probability proportional to weights (tau^alpha * eta^beta) and propagates it
+    cells = np.array(start_cells, dtype=np.uint8)
+    mask = allowed.copy()
+    peer_index = geometry(size_of_cells(len(cells))).peer_index
+    last_digit = mask.shape[1] - 1
+    open_cells = np.flatnonzero(cells == 0)
+    if len(open_cells) == 0:
+        return cells
+    for index in np.roll(open_cells, -rng.integers(len(open_cells))):
+        if cells[index] or not mask[index].any():
+            continue
+        cumulative = np.cumsum(weights[index] * mask[index])
+        digit = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+        _place(cells, mask, peer_index, index, min(digit, last_digit))
+    return cells
+
+
+def colony_fitness(solutions, base_violations):
+    # Placements never add conflicts, so an ant's fitness only depends on the cells it left empty
+    return -(base_violations + 10 * (solutions == 0).sum(axis=1))
+
+
+# Per-process state for parallel construction, set once by _init_ant_worker
+_worker = None
+
+
+def _init_ant_worker(shm_name, start_cells, allowed, heuristic_weight, alpha, base_violations):
+    global _worker
+    shm = shared_memory.SharedMemory(name=shm_name)
+    pheromone = np.ndarray(allowed.shape, dtype=np.float64, buffer=shm.buf)
+    _worker = (shm, pheromone, start_cells, allowed, heuristic_weight, alpha, base_violations)
+
+
+def _construct_ants(args):
+    # Runs in a worker: build a batch of ants against the current pheromone snapshot,
+    # which the parent only rewrites between iterations
+    num_ants, seed = args
+    shm, pheromone, start_cells, allowed, heuristic_weight, alpha, base_violations = _worker
+    weights = pheromone ** alpha * heuristic_weight
+    rng = np.random.default_rng(seed)
+    solutions = np.stack([construct_ant(start_cells, allowed, weights, rng) for _ in range(num_ants)])
+    return solutions.tobytes(), colony_fitness(solutions, base_violations)
+
+
+def _parallel_ants(pool, num_ants, num_workers, rng):
+    # Split the iteration's ants over the workers; solutions come back as one byte per cell per ant
+    batches = [num_ants // num_workers + (i < num_ants % num_workers) for i in range(num_workers)]
+    seeds = rng.integers(2 ** 63, size=num_workers)
+    tasks = [(size, int(seed)) for size, seed in zip(batches, seeds) if size]
+    results = pool.map(_construct_ants, tasks)
+    solutions = np.frombuffer(b''.join(data for data, _ in results), dtype=np.uint8).reshape(num_ants, -1)
+    return solutions, np.concatenate([fitness for _, fitness in results])
+
+
+def ant_colony_optimization(board, num_ants=10, num_iterations=100, alpha=1, beta=2, evaporation_rate=0.5, deadline=None,
+                            num_workers=1, seed=None):
+    # board: a SudokuBoard or a board string, of any supported size
+    # deadline: optional time.time() value after which the best board so far is returned
+    # seed: optional RNG seed for repeatable runs (worker batches get seeds drawn from it)
+    # num_workers: above 1, each iteration's ants are built in that many processes, which
+    # read the pheromone matrix from shared memory
+
+    # Start from the propagated board; fall back to the raw one if it is contradictory
+    propagated = propagate_board(board)
+    if propagated is not None:
+        board, candidates = propagated
+    else:
+        board = SudokuBoard(board)
+        candidates = [[set(range(1, board.size + 1)) for _ in range(board.size)] for _ in range(board.size)]
+    size = board.size
+
+    start_cells = np.frombuffer(bytes(board.cells), dtype=np.uint8)
+    open_cells = np.flatnonzero(start_cells == 0)
+    valid = valid_digits(board.cells)
+
+    # Digits an ant may put in each open cell: propagated candidates that are still valid
+    allowed = np.zeros((size * size, size), dtype=bool)
+    for index in open_cells:
+        allowed[index, [num - 1 for num in candidates[index // size][index % size]]] = True
+    allowed &= valid
+
+    heuristic_weight = calculate_heuristic(valid) ** beta
+    pheromone = np.where(allowed, 1.0, 0.0)
+
+    base_violations = count_violations(board.cells)
+    rng = np.random.default_rng(seed)
+
+    pool = shm = snapshot = None
+    if num_workers > 1 and len(open_cells) > 0:
+        shm = shared_memory.SharedMemory(create=True, size=pheromone.nbytes)
+        snapshot = np.ndarray(pheromone.shape, dtype=np.float64, buffer=shm.buf)
+        pool = multiprocessing.Pool(num_workers, initializer=_init_ant_worker,
+                                    initargs=(shm.name, start_cells, allowed, heuristic_weight, alpha, base_violations))
 
     # Main loop
+    recorder = instrumentation.active()
     best_solution = None
-    for iteration in range(num_iterations):
-        solutions = []
-        for _ in range(num_ants):
-            new_board = ant_solution(board)
-            if new_board:
-                solutions.append(new_board)
-
-        # Update pheromones
-        for row in range(9):
-            for col in range(9):
-                if initial_board[row][col] == 0:
-                    for num in range(1, 10):
-                        if board.is_valid(row, col, num):
-                            pheromone[(row, col, num)] *= (1 - evaporation_rate)  # Evaporation
-
-        for solution in solutions:
-            if solution:
-                # Reward ants that found valid solutions
-                reward = 1.0
-                for row in range(9):
-                    for col in range(9):
-                        if initial_board[row][col] == 0:
-                            num = solution[row][col]
-                            if board.is_valid(row, col, num):
-                                pheromone[(row, col, num)] += reward
-
-                # Update best solution
-                if best_solution is None:
-                    best_solution = solution
-                else:
-                    # Check if the current solution is better than the best solution
-                    is_better = True
-                    for row in range(9):
-                        for col in range(9):
-                            if initial_board[row][col] == 0:
-                                if solution[row][col] != best_solution[row][col]:
-                                    is_better = False
-                                    break
-                        if not is_better:
-                            break
-                    if is_better:
-                        best_solution = solution
-
-    if best_solution:
-        # Convert the solution to a SudokuBoard object
-        solution_string = "".join([str(x) for row in best_solution for x in row])
-        return SudokuBoard(solution_string)
-    else:
-        return None
+    best_fitness = None
+    try:
+        for iteration in range(num_iterations):
+            if deadline is not None and time.time() >= deadline:
+                break
+            if pool is None:
+                weights = pheromone ** alpha * heuristic_weight
+                solutions = np.stack([construct_ant(start_cells, allowed, weights, rng) for _ in range(num_ants)])
+                fitness = colony_fitness(solutions, base_violations)
+            else:
+                snapshot[:] = pheromone
+                solutions, fitness = _parallel_ants(pool, num_ants, num_workers, rng)
+
+            # Evaporation, then every ant deposits in proportion to how few gaps it left
+            pheromone *= (1 - evaporation_rate)
+            rewards = 1.0 / (1 - fitness)
+            ants, positions = np.nonzero(solutions[:, open_cells])
+            cells = open_cells[positions]
+            np.add.at(pheromone, (cells, solutions[ants, cells] - 1), rewards[ants])
+            np.maximum(pheromone, MIN_PHEROMONE, out=pheromone, where=allowed)
+
+            # Update best solution
+            ant = int(fitness.argmax())
+            if best_fitness is None or fitness[ant] > best_fitness:
+                best_solution = SudokuBoard(solutions[ant].tobytes())
+                best_fitness = int(fitness[ant])
+            if recorder is not None:
+                recorder.count("aco_iterations")
+                recorder.count("ants_built", len(solutions))
+                recorder.best_fitness("aco", best_fitness, best_solution.cells)
+
+            if best_fitness == 0:
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            del snapshot
+            shm.close()
+            shm.unlink()
+
+    return best_solution
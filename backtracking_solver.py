@@ -1,27 +1,41 @@
-from sudoku import SudokuBoard
+import instrumentation
+from constraint_engine import ConstraintGrid
+from propagation import propagate_masks, search_masks
+from sudoku import board_size
 
 def find_empty(board):
-    
+
     for i in range(9):
         for j in range(9):
             if board[i][j] == 0:
                 return i, j
     return None
 
-def solve_backtracking(board):
-    
-    empty = find_empty(board)
-    if not empty:
-        # No empty cell left, puzzle solved
+def solve_backtracking(board, deadline=None):
+    # Reduce the domains first, then search on incrementally maintained
+    # row/column/box bitmasks instead of rebuilding a SudokuBoard per digit.
+    # board is a list of lists of any supported size, filled in place.
+    # deadline bounds the 16x16/25x25 search; 9x9 searches finish in milliseconds.
+    domains = propagate_masks(board)
+    if domains is None:
+        # The givens lead to a contradiction, so there is nothing to search
+        return False
+    size = board_size(board)
+    if size > 9:
+        # On 16x16 and 25x25 grids a guess without propagation is found wrong far too
+        # late, so the search there re-propagates after every guess instead
+        masks = search_masks(domains, size, deadline)
+        if masks is None:
+            return False
+        for index, mask in enumerate(masks):
+            board[index // size][index % size] = mask.bit_length() - 1
         return True
-    row, col = empty
-    for num in range(1, 10):
-        # Check if num is valid in this position
-        if SudokuBoard("".join([str(x) for row in board for x in row])).is_valid(row, col, num):
-            board[row][col] = num
-            if solve_backtracking(board):
-                return True
-            # Undo assignment (backtrack)
-            board[row][col] = 0
-    # No valid number found, trigger backtracking
-    return False 
\ No newline at end of file
+    grid = ConstraintGrid(board, domains)
+    solved = grid.solve()
+    recorder = instrumentation.active()
+    if recorder is not None:
+        recorder.count("backtracking_nodes", grid.nodes)
+    if not solved:
+        return False
+    grid.write_to(board)
+    return True
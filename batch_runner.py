@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from math import isqrt
+from solver_registry import EXACT_SOLVERS, get_solver, supports
+from results_store import ResultsStore
+from sudoku import ALPHABET, BOARD_SIZES, SudokuBoard
+
+# Only the exact solvers share the fill-in-place contract the workers rely on
+BATCH_SOLVERS = EXACT_SOLVERS
+
+
+def parse_puzzle_line(line):
+    # Standard one-puzzle-per-line format: 81 cells (or 16, 256 or 625 for the
+    # other grid sides), '0' or '.' for blanks, optionally followed by
+    # whitespace and anything else (ratings, comments)
+    tokens = line.split()
+    token = tokens[0] if tokens else ""
+    size = isqrt(len(token))
+    if size * size != len(token) or size not in BOARD_SIZES:
+        raise ValueError(f"expected 81 cells (or 16, 256 or 625), got {len(token)}")
+    digits = ALPHABET[:size]
+    if set(token.upper()) - set("0." + digits):
+        raise ValueError(f"cells must be {digits[0]}-{digits[-1]}, '0' or '.'")
+    return SudokuBoard(token).board_string
+
+
+def parse_puzzle_board(board):
+    # A {"board": [[...], ...]} array: every cell 0 (blank) up to the grid side
+    board = SudokuBoard(board)
+    if max(board.cells) > board.size:
+        raise ValueError(f"cells must be 0-{board.size}")
+    return board.board_string
+
+
+def read_puzzles(path):
+    """Yield (puzzle_id, board_string or None, error or None) from a JSON, JSON Lines or plain line file ('-' for stdin)."""
+    if path != "-" and path.endswith(".json"):
+        # Same layout as sudoku_boards.json: a list of {"id": ..., "board": [[...], ...]}
+        with open(path, 'r') as f:
+            puzzles = json.load(f)
+        for number, puzzle in enumerate(puzzles, start=1):
+            try:
+                yield puzzle['id'], parse_puzzle_board(puzzle['board']), None
+            except (KeyError, TypeError, ValueError) as e:
+                puzzle_id = puzzle.get('id', number) if isinstance(puzzle, dict) else number
+                yield puzzle_id, None, f"missing field {e}" if isinstance(e, KeyError) else str(e)
+        return
+
+    f = sys.stdin if path == "-" else open(path, 'r')
+    try:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            puzzle_id = line_number
+            try:
+                if line.startswith('{'):
+                    # JSON Lines: {"id": ..., "puzzle": "<81 chars>"} or {"id": ..., "board": [[...]]}
+                    record = json.loads(line)
+                    puzzle_id = record.get('id', line_number)
+                    if 'board' in record:
+                        yield puzzle_id, parse_puzzle_board(record['board']), None
+                        continue
+                    line = record.get('puzzle', '')
+                    if not isinstance(line, str):
+                        raise ValueError("puzzle must be a string")
+                yield puzzle_id, parse_puzzle_line(line), None
+            except (TypeError, ValueError) as e:
+                # json.JSONDecodeError is a ValueError too
+                yield puzzle_id, None, str(e)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _solve_one(solver, solver_name, puzzle_id, board_string):
+    board = SudokuBoard(board_string)
+    if not supports(solver_name, board.size):
+        return {"id": puzzle_id, "error": f"{solver_name} cannot solve {board.size}x{board.size} grids"}
+    board = board.get_board()
+    start = time.perf_counter()
+    solved = solver(board)
+    elapsed = time.perf_counter() - start
+    return {
+        "id": puzzle_id,
+        "puzzle": board_string,
+        "solution": SudokuBoard(board).board_string if solved else None,
+        "time": round(elapsed, 6),
+    }
+
+
+def solve_chunk(chunk, solver_name):
+    # Runs in a worker process: solve a list of (puzzle_id, board_string, error) tuples
+    solver = get_solver(solver_name)
+    results = []
+    for puzzle_id, board_string, error in chunk:
+        if error is not None:
+            results.append({"id": puzzle_id, "error": error})
+            continue
+        try:
+            results.append(_solve_one(solver, solver_name, puzzle_id, board_string))
+        except Exception as e:
+            # One bad puzzle must not take the rest of the chunk down with it
+            results.append({"id": puzzle_id, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def _chunks(puzzles, chunk_size):
+    chunk = []
+    for puzzle in puzzles:
+        chunk.append(puzzle)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def format_result(result, output_format):
+    if output_format == "csv":
+        if "error" in result:
+            return f"{result['id']},,,,{result['error']}"
+        return f"{result['id']},{result['puzzle']},{result['solution'] or ''},{result['time']:.6f},"
+    return json.dumps(result)
+
+
+def run_batch(puzzles, out, solver_name="backtracking", workers=None, chunk_size=64, max_in_flight=None,
+              output_format="jsonl", store=None):
+    """
+    Stream puzzles through a process pool and write each result as soon as its
+    chunk finishes. At most max_in_flight chunks are queued at once, so memory
+    stays flat no matter how large the input is. Results are also queued on
+    store (a ResultsStore) when one is given. Returns (solved, total).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    solved = total = 0
+    if output_format == "csv":
+        out.write("id,puzzle,solution,seconds,error\n")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        chunks = _chunks(puzzles, chunk_size)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(solve_chunk, chunk, solver_name))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for result in future.result():
+                    total += 1
+                    if result.get("solution"):
+                        solved += 1
+                    out.write(format_result(result, output_format) + "\n")
+                    if store is not None and "error" not in result:
+                        store.record(result["id"], result["puzzle"], result["time"], solution=result["solution"],
+                                     solver=solver_name)
+            out.flush()
+    return solved, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many Sudoku puzzles through a worker pool")
+    parser.add_argument("input", help="puzzle file (.json, .jsonl or one puzzle string per line), '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="where to write results, '-' for stdout")
+    parser.add_argument("--solver", choices=sorted(BATCH_SOLVERS), default="backtracking")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="puzzles sent to a worker at a time")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="chunks queued at once (default: 4 per worker)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", dest="output_format")
+    parser.add_argument("--db", default=None, help="also record every result in this SQLite results database")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w')
+    store = ResultsStore(args.db) if args.db else None
+    start = time.perf_counter()
+    try:
+        solved, total = run_batch(read_puzzles(args.input), out, args.solver, args.workers, args.chunk_size,
+                                  args.max_in_flight, args.output_format, store)
+    finally:
+        if store is not None:
+            store.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Solved {solved}/{total} puzzles in {elapsed:.2f} seconds ({rate:.0f} puzzles/s)", file=sys.stderr)
+    return 0 if solved == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# Many puzzles at once: the batched counterpart of solve_backtracking. Every
+# board in an (n, 81) array is held as candidate bitmasks (bit d for digit d,
+# as in constraint_engine) and propagated with whole-array NumPy operations;
+# only the boards propagation leaves open go on to guess. The search is a
+# depth-first search run in lockstep: each open board tries the lowest digit
+# of its most constrained cell, and the same board without that digit is
+# pushed on a stack that is drained once the active set runs low. Solved
+# boards leave the active set, and every pending state of a solved puzzle is
+# dropped the next time it comes off the stack.
+import numpy as np
+from constraint_engine import ALL_DIGITS, COUNT_OF, DIGITS_OF
+from units import UNIT_INDEX, CELL_UNIT_INDEX
+
+# Puzzles propagated together. Small enough that the per-round gathers stay in
+# cache, large enough to amortise the per-call NumPy overhead.
+CHUNK_SIZE = 1024
+
+# Row, column and box unit number of every cell
+ROW_UNIT_OF, COLUMN_UNIT_OF, BOX_UNIT_OF = np.ascontiguousarray(CELL_UNIT_INDEX.T)
+
+COUNT_TABLE = np.array(COUNT_OF, dtype=np.uint8)
+# Digit of a single-candidate mask, 0 for anything else
+DIGIT_TABLE = np.array([DIGITS_OF[mask][0] if COUNT_OF[mask] == 1 else 0 for mask in range(1 << 10)],
+                       dtype=np.uint8)
+
+
+def puzzles_to_array(puzzles):
+    # (n, 81) uint8 array from a sequence of 81-char strings or anything array-like
+    if len(puzzles) and isinstance(puzzles[0], str):
+        text = "".join(puzzles).replace('.', '0').encode()
+        return (np.frombuffer(text, dtype=np.uint8) - ord('0')).reshape(len(puzzles), 81)
+    return np.asarray(puzzles, dtype=np.uint8).reshape(-1, 81)
+
+
+def _unit_seen(masks):
+    # Per unit, the digits seen in at least one cell and in at least two cells
+    # Gathered position-major, (k, 9, 27), so each step reads a contiguous slice
+    units = masks[:, UNIT_INDEX.T]
+    once = np.zeros((len(masks), 27), dtype=np.uint16)
+    twice = np.zeros_like(once)
+    for position in range(9):
+        values = units[:, position]
+        twice |= once & values
+        once |= values
+    return once, twice
+
+
+def _spread(unit_bits):
+    # OR of a per-unit mask over the row, column and box of every cell
+    return unit_bits[:, ROW_UNIT_OF] | unit_bits[:, COLUMN_UNIT_OF] | unit_bits[:, BOX_UNIT_OF]
+
+
+def _propagate_step(masks):
+    # One round of naked and hidden singles over a (k, 81) block of masks.
+    # Returns the new masks and which boards hit a contradiction.
+    singles = COUNT_TABLE[masks] == 1
+    fixed_once, fixed_twice = _unit_seen(np.where(singles, masks, 0))
+    # Naked singles: a fixed digit leaves every open cell it sees
+    masks = np.where(singles, masks, masks & ~_spread(fixed_once))
+    # Hidden singles: a digit with one place left in a unit goes there
+    placed_once, placed_twice = _unit_seen(masks)
+    hidden = masks & _spread(placed_once & ~placed_twice)
+    open_hidden = (hidden != 0) & ~singles
+    masks = np.where(open_hidden, hidden, masks)
+    dead = ((fixed_twice != 0).any(axis=1)
+            | (placed_once != ALL_DIGITS).any(axis=1)
+            | (masks == 0).any(axis=1)
+            | (open_hidden & (COUNT_TABLE[hidden] > 1)).any(axis=1))
+    return masks, dead
+
+
+def propagate_batch(masks):
+    # Propagate every board to a fixed point, in place; returns the boards left contradictory
+    dead = np.zeros(len(masks), dtype=bool)
+    pending = np.arange(len(masks))
+    while len(pending):
+        before = masks[pending]
+        after, contradiction = _propagate_step(before)
+        masks[pending] = after
+        dead[pending[contradiction]] = True
+        changed = (after != before).any(axis=1) & ~contradiction
+        pending = pending[changed]
+    return dead
+
+
+def _solve_chunk(puzzles, solutions, solved, chunk_size):
+    # Fill solutions/solved for one chunk of puzzles; states carry the row they belong to
+    masks = np.where(puzzles != 0, np.left_shift(1, puzzles, dtype=np.uint16), ALL_DIGITS).astype(np.uint16)
+    origins = np.arange(len(puzzles))
+    stack = []
+    while True:
+        dead = propagate_batch(masks)
+        counts = COUNT_TABLE[masks]
+        complete = ~dead & (counts == 1).all(axis=1)
+        done = origins[complete]
+        solutions[done] = DIGIT_TABLE[masks[complete]]
+        solved[done] = True
+
+        # Only the boards propagation left open branch
+        keep = ~dead & ~complete & ~solved[origins]
+        masks, origins, counts = masks[keep], origins[keep], counts[keep]
+        while len(masks) < chunk_size // 2 and stack:
+            pending_masks, pending_origins = stack.pop()
+            unsolved = ~solved[pending_origins]
+            masks = np.concatenate((masks, pending_masks[unsolved]))
+            origins = np.concatenate((origins, pending_origins[unsolved]))
+            counts = COUNT_TABLE[masks]
+        if not len(masks):
+            return
+
+        # Guess the lowest digit of the most constrained cell; the rest of its digits wait on the stack
+        rows = np.arange(len(masks))
+        cells = np.where(counts > 1, counts, 10).argmin(axis=1)
+        options = masks[rows, cells]
+        guess = options & (~options + np.uint16(1))
+        remaining = masks.copy()
+        remaining[rows, cells] = options & ~guess
+        stack.append((remaining, origins.copy()))
+        masks[rows, cells] = guess
+
+
+def solve_backtracking_batch(puzzles, chunk_size=None):
+    """
+    Solve many puzzles at once. puzzles is an (n, 81) array-like of digits
+    (0 for blanks) or a sequence of 81-char strings. Returns (solutions,
+    solved): an (n, 81) uint8 array, with rows of zeros where no solution
+    exists, and an (n,) bool array. Puzzles with several solutions get one
+    of them.
+    """
+    puzzles = puzzles_to_array(puzzles)
+    chunk_size = chunk_size or CHUNK_SIZE
+    solutions = np.zeros_like(puzzles)
+    solved = np.zeros(len(puzzles), dtype=bool)
+    for start in range(0, len(puzzles), chunk_size):
+        end = start + chunk_size
+        _solve_chunk(puzzles[start:end], solutions[start:end], solved[start:end], chunk_size)
+    return solutions, solved
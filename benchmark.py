@@ -0,0 +1,405 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sudoku import SudokuBoard
+from genetic_algorithm import calculate_fitness
+from fitness_tracker import FitnessTracker
+
+JSON_PATH = "sudoku_boards.json"
+
+# Modules that make startup slow; the fast path must not load any of them
+HEAVY_MODULES = ("numpy", "skfuzzy", "scipy", "networkx")
+
+# Statements timed by the imports benchmark, each in a fresh interpreter
+IMPORT_TARGETS = {
+    "main": "import main",
+    "backtracking": "import main; from solver_registry import get_solver; get_solver('backtracking')",
+    "dlx": "import main; from solver_registry import get_solver; get_solver('dlx')",
+    "batch": "import batch_runner",
+    "hybrid": "import main; from solver_registry import get_solver; get_solver('hybrid')",
+    "fuzzy": "import main; from solver_registry import get_solver; get_solver('fuzzy')",
+}
+FAST_PATH = ("main", "backtracking", "dlx", "batch")
+
+# Backends measured by the suite, by solver_registry name
+SUITE_SOLVERS = ("backtracking", "genetic", "vectorized_ga", "fuzzy", "aco", "hybrid")
+
+# Generated tiers, easiest first: generator difficulties
+GENERATED_TIERS = ("easy", "medium", "hard", "extreme")
+
+# Backends and grid sides measured by the scaling benchmark
+SCALING_SOLVERS = ("backtracking", "permutation_ga", "aco")
+SCALING_SIZES = (9, 16, 25)
+
+# Latency changes smaller than this are noise, whatever the ratio
+MIN_LATENCY_DELTA = 0.005
+
+# Instrumentation counters the suite reports per second of solving
+THROUGHPUT_COUNTERS = ("generations", "backtracking_nodes", "dlx_nodes", "ants_built")
+
+
+def load_boards(file_path=JSON_PATH):
+    with open(file_path, 'r') as f:
+        return [SudokuBoard(p['board']) for p in json.load(f)]
+
+
+def random_fill(board, rng):
+    # Copy of the board with every empty cell filled at random, like a GA individual
+    filled = board.copy()
+    for index, num in enumerate(filled.cells):
+        if num == 0:
+            filled.cells[index] = rng.randint(1, 9)
+    return filled
+
+
+def _rate(step, duration):
+    # Calls of step() per second over roughly `duration` seconds
+    count = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            step()
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def bench_fitness(puzzle, duration=2.0, seed=0):
+    # Evaluations per second after a single-cell mutation: full rescan vs FitnessTracker delta
+    rng = random.Random(seed)
+    open_cells = [i for i, num in enumerate(puzzle.cells) if num == 0]
+    board = random_fill(puzzle, rng)
+    tracker = FitnessTracker(board)
+
+    def full_rescan():
+        board.cells[rng.choice(open_cells)] = rng.randint(1, 9)
+        return calculate_fitness(board)
+
+    def delta_update():
+        tracker.set(rng.choice(open_cells), rng.randint(1, 9))
+        return tracker.fitness()
+
+    full = _rate(full_rescan, duration)
+    delta = _rate(delta_update, duration)
+    return {"full_rescan_per_sec": full, "delta_per_sec": delta, "speedup": delta / full}
+
+
+def bench_imports(targets=IMPORT_TARGETS, repeats=5):
+    # Median import time of each target and the heavy modules it left in sys.modules
+    code = ("import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "{statement}\n"
+            "seconds = time.perf_counter() - start\n"
+            "print(json.dumps({{'seconds': seconds, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))")
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name in targets:
+        runs = []
+        for _ in range(repeats):
+            completed = subprocess.run([sys.executable, "-c", code.format(statement=IMPORT_TARGETS[name], heavy=HEAVY_MODULES)],
+                                       capture_output=True, text=True, check=True, cwd=here)
+            runs.append(json.loads(completed.stdout.splitlines()[-1]))
+        results[name] = {"seconds": statistics.median(run["seconds"] for run in runs), "heavy": runs[0]["heavy"]}
+    return results
+
+
+def random_variant(cells, rng):
+    # The same puzzle under a random symmetry: transposition, band/row and stack/column
+    # permutations and a digit relabelling (any grid size)
+    size = math.isqrt(len(cells))
+    order = math.isqrt(size)
+    grid = [list(cells[row * size:row * size + size]) for row in range(size)]
+    if rng.random() < 0.5:
+        grid = [list(col) for col in zip(*grid)]
+    rows = [band * order + offset for band in rng.sample(range(order), order) for offset in rng.sample(range(order), order)]
+    cols = [stack * order + offset for stack in rng.sample(range(order), order)
+            for offset in rng.sample(range(order), order)]
+    digits = [0] + rng.sample(range(1, size + 1), size)
+    return bytes(digits[grid[row][col]] for row in rows for col in cols)
+
+
+def pattern_grid(size):
+    # A valid filled grid of any size: row r is the base row shifted by (r % order) * order + r // order
+    order = math.isqrt(size)
+    return bytes((order * (row % order) + row // order + col) % size + 1 for row in range(size) for col in range(size))
+
+
+def build_tiers(per_tier=5, seed=0):
+    # Tier name -> list of 81-char puzzles. "sample" is sudoku_boards.json; the other
+    # tiers are uniquely solvable puzzles from the generator, one tier per difficulty.
+    from generator import generate_puzzle
+    tiers = {"sample": [board.board_string for board in load_boards()]}
+    for tier in GENERATED_TIERS:
+        tiers[tier] = [generate_puzzle(random.Random(f"{seed}:{tier}:{i}"), difficulty=tier)["puzzle"]
+                       for i in range(per_tier)]
+    return tiers
+
+
+def _percentile(values, q):
+    # Linear interpolation between closest ranks, q in [0, 100]
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _run_backend(name, tiers, seed, time_limit):
+    # Runs in its own process, so the peak RSS reported belongs to this backend alone
+    import instrumentation
+    from solver_registry import run_solver
+    report = {}
+    for tier, puzzles in tiers.items():
+        latencies, solved = [], 0
+        counts = dict.fromkeys(THROUGHPUT_COUNTERS, 0)
+        for i, puzzle in enumerate(puzzles):
+            random.seed(seed + i)
+            deadline = time.time() + time_limit if time_limit else None
+            with instrumentation.recording(count_is_valid=False) as recorder:
+                _, stats = run_solver(name, puzzle, deadline, seed=seed + i)
+            latencies.append(stats["seconds"])
+            solved += stats["solved"]
+            for counter in THROUGHPUT_COUNTERS:
+                counts[counter] += recorder.counters.get(counter, 0)
+        total = sum(latencies)
+        report[tier] = {
+            "puzzles": len(puzzles),
+            "solve_rate": solved / len(puzzles),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "puzzles_per_sec": len(puzzles) / total if total > 0 else None,
+            # Only the counters this backend reports, e.g. generations for the GAs
+            "per_sec": {counter: count / total for counter, count in counts.items() if count and total > 0},
+        }
+    # ru_maxrss is in kilobytes on Linux; pools started by the backend count as children
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {"peak_rss_kb": peak_kb, "tiers": report}
+
+
+def bench_suite(solvers=SUITE_SOLVERS, per_tier=5, seed=0, time_limit=10.0):
+    """Run every backend over every tier, one fresh process per backend. Returns a JSON-ready dict."""
+    tiers = build_tiers(per_tier, seed)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in solvers:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(_run_backend, name, tiers, seed, time_limit).result()
+    return {
+        "seed": seed,
+        "per_tier": per_tier,
+        "time_limit": time_limit,
+        "tiers": {tier: len(puzzles) for tier, puzzles in tiers.items()},
+        "results": results,
+    }
+
+
+def _solve_slice(puzzles):
+    from batch_solver import solve_backtracking_batch
+    return int(solve_backtracking_batch(puzzles)[1].sum())
+
+
+def bench_batch(count=1_000_000, workers=1, duration=2.0):
+    """
+    Throughput of solve_backtracking_batch on sudoku_boards.json replicated to
+    `count` puzzles, split evenly over `workers` processes, next to
+    solve_backtracking called once per puzzle.
+    """
+    import numpy as np
+    boards = load_boards()
+    puzzles = np.tile(np.frombuffer(b"".join(bytes(board.cells) for board in boards), dtype=np.uint8).reshape(-1, 81),
+                      (count // len(boards) + 1, 1))[:count]
+
+    from backtracking_solver import solve_backtracking
+    pool = itertools.cycle(boards)
+    single_rate = _rate(lambda: solve_backtracking(next(pool).get_board()), duration)
+
+    start = time.perf_counter()
+    if workers == 1:
+        solved = _solve_slice(puzzles)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            solved = sum(executor.map(_solve_slice, np.array_split(puzzles, workers)))
+    elapsed = time.perf_counter() - start
+    return {
+        "puzzles": count,
+        "solved": solved,
+        "workers": workers,
+        "seconds": elapsed,
+        "puzzles_per_sec": count / elapsed,
+        "puzzles_per_sec_per_core": count / elapsed / workers,
+        "single_puzzle_per_sec": single_rate,
+    }
+
+
+def _run_scaling(name, size, puzzles, seed, time_limit):
+    # Runs in its own process, like _run_backend, so peak RSS is per solver and size
+    from solver_registry import run_solver
+    latencies, solved = [], 0
+    for i, puzzle in enumerate(puzzles):
+        deadline = time.time() + time_limit if time_limit else None
+        _, stats = run_solver(name, puzzle, deadline, seed=seed + i)
+        latencies.append(stats["seconds"])
+        solved += stats["solved"]
+    return {
+        "puzzles": len(puzzles),
+        "solve_rate": solved / len(puzzles),
+        "p50": _percentile(latencies, 50),
+        "max": max(latencies),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def bench_scaling(solvers=SCALING_SOLVERS, sizes=SCALING_SIZES, per_size=3, blanks=0.5, seed=0, time_limit=30.0):
+    """
+    Time and peak memory of each solver from 9x9 up to 25x25. Puzzles are random
+    symmetric variants of a filled pattern grid with a `blanks` fraction of
+    cells cleared; every one is solvable, uniqueness is not checked.
+    """
+    rng = random.Random(seed)
+    puzzles = {}
+    for size in sizes:
+        puzzles[size] = []
+        for _ in range(per_size):
+            cells = bytearray(random_variant(pattern_grid(size), rng))
+            for index in rng.sample(range(size * size), int(size * size * blanks)):
+                cells[index] = 0
+            puzzles[size].append(SudokuBoard(cells).board_string)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in solvers:
+        results[name] = {}
+        for size in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[name][size] = executor.submit(_run_scaling, name, size, puzzles[size], seed, time_limit).result()
+    return {"seed": seed, "per_size": per_size, "blanks": blanks, "time_limit": time_limit, "results": results}
+
+
+def compare_to_baseline(current, baseline, tolerance=0.25):
+    # Regressions of current against baseline: a lower solve rate, p50/p95 latency
+    # more than `tolerance` slower, nodes/generations/ants per second down by as
+    # much, or peak RSS more than `tolerance` larger
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["peak_rss_kb"] > base["peak_rss_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_kb']} -> {result['peak_rss_kb']} KB")
+        for tier, metrics in result["tiers"].items():
+            base_metrics = base["tiers"].get(tier)
+            if base_metrics is None:
+                continue
+            if metrics["solve_rate"] < base_metrics["solve_rate"]:
+                regressions.append(f"{name}/{tier}: solve rate {base_metrics['solve_rate']:.0%} -> "
+                                   f"{metrics['solve_rate']:.0%}")
+            for key in ("p50", "p95"):
+                slower = metrics[key] - base_metrics[key]
+                if slower > MIN_LATENCY_DELTA and metrics[key] > base_metrics[key] * (1 + tolerance):
+                    regressions.append(f"{name}/{tier}: {key} {base_metrics[key]:.4f} -> {metrics[key]:.4f} s")
+            # Rates from tiers that finish within the latency noise floor are noise too
+            if base_metrics["p50"] < MIN_LATENCY_DELTA:
+                continue
+            for counter, rate in metrics.get("per_sec", {}).items():
+                base_rate = base_metrics.get("per_sec", {}).get(counter)
+                if base_rate and rate * (1 + tolerance) < base_rate:
+                    regressions.append(f"{name}/{tier}: {counter}/s {base_rate:,.0f} -> {rate:,.0f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sudoku solver benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fitness_parser = subparsers.add_parser("fitness", help="fitness evaluations per second, full rescan vs incremental")
+    fitness_parser.add_argument("--board", type=int, default=0, help="index into sudoku_boards.json")
+    fitness_parser.add_argument("--seconds", type=float, default=2.0)
+
+    imports_parser = subparsers.add_parser("imports", help="import time of the CLI and of each solver backend")
+    imports_parser.add_argument("--repeats", type=int, default=5)
+    imports_parser.add_argument("--check", action="store_true",
+                                help="exit with an error if the fast path imports a heavy dependency")
+
+    suite_parser = subparsers.add_parser("suite", help="every backend over tiered puzzle sets")
+    suite_parser.add_argument("--solvers", nargs="+", default=list(SUITE_SOLVERS))
+    suite_parser.add_argument("--per-tier", type=int, default=5, help="generated puzzles per tier")
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--time-limit", type=float, default=10.0, help="seconds allowed per puzzle")
+    suite_parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    suite_parser.add_argument("--baseline", default=None, help="JSON from an earlier run to compare against")
+    suite_parser.add_argument("--tolerance", type=float, default=0.25,
+                              help="allowed relative slowdown or memory growth before a regression is reported")
+
+    batch_parser = subparsers.add_parser("batch", help="many-puzzles-at-once solver throughput")
+    batch_parser.add_argument("--count", type=int, default=1_000_000, help="puzzles, sudoku_boards.json replicated")
+    batch_parser.add_argument("--workers", type=int, default=1)
+
+    scaling_parser = subparsers.add_parser("scaling", help="time and memory from 9x9 to 25x25 grids")
+    scaling_parser.add_argument("--solvers", nargs="+", default=list(SCALING_SOLVERS))
+    scaling_parser.add_argument("--sizes", nargs="+", type=int, default=list(SCALING_SIZES))
+    scaling_parser.add_argument("--per-size", type=int, default=3, help="puzzles per grid size")
+    scaling_parser.add_argument("--blanks", type=float, default=0.5, help="fraction of cells cleared")
+    scaling_parser.add_argument("--seed", type=int, default=0)
+    scaling_parser.add_argument("--time-limit", type=float, default=30.0, help="seconds allowed per puzzle")
+
+    args = parser.parse_args()
+
+    if args.command == "fitness":
+        result = bench_fitness(load_boards()[args.board], args.seconds)
+        print(f"Full rescan : {result['full_rescan_per_sec']:>12,.0f} evals/s")
+        print(f"Delta update: {result['delta_per_sec']:>12,.0f} evals/s")
+        print(f"Speedup     : {result['speedup']:.1f}x")
+    elif args.command == "imports":
+        results = bench_imports(repeats=args.repeats)
+        for name, result in results.items():
+            heavy = ", ".join(result['heavy']) or "-"
+            print(f"{name:<13}{result['seconds'] * 1000:>9.1f} ms   heavy: {heavy}")
+        if args.check:
+            offenders = [name for name in FAST_PATH if results[name]['heavy']]
+            if offenders:
+                print(f"Fast path imports heavy modules: {', '.join(offenders)}")
+                sys.exit(1)
+    elif args.command == "batch":
+        result = bench_batch(args.count, args.workers)
+        print(f"Solved          : {result['solved']:,} / {result['puzzles']:,} in {result['seconds']:.1f} s")
+        print(f"Batch           : {result['puzzles_per_sec']:>10,.0f} puzzles/s "
+              f"({result['puzzles_per_sec_per_core']:,.0f} per core, {result['workers']} workers)")
+        print(f"One at a time   : {result['single_puzzle_per_sec']:>10,.0f} puzzles/s")
+    elif args.command == "scaling":
+        report = bench_scaling(args.solvers, args.sizes, args.per_size, args.blanks, args.seed, args.time_limit)
+        print(f"{'solver':<16}{'size':>6}{'solved':>8}{'p50 s':>10}{'max s':>10}{'peak RSS MB':>13}")
+        for name, by_size in report["results"].items():
+            for size, metrics in by_size.items():
+                print(f"{name:<16}{f'{size}x{size}':>6}{metrics['solve_rate']:>8.0%}{metrics['p50']:>10.4f}"
+                      f"{metrics['max']:>10.4f}{metrics['peak_rss_kb'] / 1024:>13.1f}")
+    elif args.command == "suite":
+        report = bench_suite(args.solvers, args.per_tier, args.seed, args.time_limit)
+        print(f"{'solver':<15}{'tier':<9}{'solved':>8}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'puzzles/s':>11}")
+        for name, result in report["results"].items():
+            for tier, metrics in result["tiers"].items():
+                rate = metrics["puzzles_per_sec"]
+                work = "  ".join(f"{counter}/s {count:,.0f}" for counter, count in metrics["per_sec"].items())
+                print(f"{name:<15}{tier:<9}{metrics['solve_rate']:>8.0%}{metrics['p50']:>10.4f}{metrics['p95']:>10.4f}"
+                      f"{metrics['p99']:>10.4f}{rate if rate is not None else 0:>11.1f}  {work}")
+            print(f"{name:<15}peak RSS {result['peak_rss_kb'] / 1024:.1f} MB")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        if args.baseline:
+            with open(args.baseline, 'r') as f:
+                regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
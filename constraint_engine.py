@@ -0,0 +1,116 @@
+from sudoku import flat_cells
+from units import geometry, size_of_cells
+
+# Bit d (1..size) of a mask stands for digit d; bit 0 is unused. Masks are
+# plain ints, one machine word even on a 25x25 grid.
+ALL_DIGITS = 0b1111111110
+
+
+def digit_mask(size):
+    # Every digit of a size x size grid
+    return ((1 << size) - 1) << 1
+
+
+# Lookup tables indexed by mask: the digits it contains and how many there are.
+# They cover 9x9 masks; wider ones go through mask_digits and int.bit_count.
+DIGITS_OF = [[d for d in range(1, 10) if mask & (1 << d)] for mask in range(1 << 10)]
+COUNT_OF = [len(digits) for digits in DIGITS_OF]
+
+
+def mask_digits(mask):
+    # The digits of a mask of any width, ascending
+    if mask < 1024:
+        return DIGITS_OF[mask]
+    return [d for d in range(1, mask.bit_length()) if mask >> d & 1]
+
+
+class ConstraintGrid:
+    """Sudoku grid that keeps row/column/box digit masks in sync on every place/unplace."""
+
+    __slots__ = ("cells", "rows", "cols", "boxes", "domains", "nodes", "row_of", "col_of", "box_of")
+
+    def __init__(self, board, domains=None):
+        # board: list of lists or SudokuBoard of any supported size
+        # domains: optional per-cell candidate masks (e.g. from propagation) that further restrict the search
+        values = flat_cells(board)
+        grid = geometry(size_of_cells(len(values)))
+        self.row_of, self.col_of, self.box_of = grid.row_of, grid.col_of, grid.box_of
+        self.domains = domains if domains is not None else [digit_mask(grid.size)] * grid.cells
+        self.cells = [0] * grid.cells
+        self.rows = [0] * grid.size
+        self.cols = [0] * grid.size
+        self.boxes = [0] * grid.size
+        self.nodes = 0  # search nodes visited by solve()
+        for index, num in enumerate(values):
+            if num == 0:
+                continue
+            if not self.candidates(index) & (1 << num):
+                raise ValueError(f"Conflicting given {num} at row {self.row_of[index]}, col {self.col_of[index]}")
+            self.place(index, num)
+
+    def candidates(self, index):
+        # Mask of digits that can still go into an empty cell
+        return self.domains[index] & ~(self.rows[self.row_of[index]] | self.cols[self.col_of[index]]
+                                       | self.boxes[self.box_of[index]])
+
+    def place(self, index, num):
+        bit = 1 << num
+        self.cells[index] = num
+        self.rows[self.row_of[index]] |= bit
+        self.cols[self.col_of[index]] |= bit
+        self.boxes[self.box_of[index]] |= bit
+
+    def unplace(self, index):
+        bit = ~(1 << self.cells[index])
+        self.cells[index] = 0
+        self.rows[self.row_of[index]] &= bit
+        self.cols[self.col_of[index]] &= bit
+        self.boxes[self.box_of[index]] &= bit
+
+    def most_constrained(self):
+        # Empty cell with the fewest candidates, or None when the grid is full
+        rows, cols, boxes, domains = self.rows, self.cols, self.boxes, self.domains
+        row_of, col_of, box_of = self.row_of, self.col_of, self.box_of
+        best_index, best_mask, best_count = None, 0, len(rows) + 1
+        for index, num in enumerate(self.cells):
+            if num == 0:
+                # candidates(), inlined: this loop is where the search spends its time
+                mask = domains[index] & ~(rows[row_of[index]] | cols[col_of[index]] | boxes[box_of[index]])
+                count = mask.bit_count()
+                if count < best_count:
+                    best_index, best_mask, best_count = index, mask, count
+                    if count <= 1:
+                        break
+        return best_index, best_mask
+
+    def solve(self):
+        self.nodes += 1
+        index, mask = self.most_constrained()
+        if index is None:
+            return True
+        for num in mask_digits(mask):
+            self.place(index, num)
+            if self.solve():
+                return True
+            self.unplace(index)
+        return False
+
+    def count_solutions(self, limit=2):
+        # Count completions, stopping early once `limit` is reached
+        index, mask = self.most_constrained()
+        if index is None:
+            return 1
+        total = 0
+        for num in mask_digits(mask):
+            self.place(index, num)
+            total += self.count_solutions(limit - total)
+            self.unplace(index)
+            if total >= limit:
+                break
+        return total
+
+    def write_to(self, board):
+        # Copy the cells back into a caller-owned list of lists
+        size = len(self.rows)
+        for i in range(size):
+            board[i][:] = self.cells[i * size:i * size + size]
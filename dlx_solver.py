@@ -0,0 +1,201 @@
+# Sudoku as exact cover, solved with Knuth's Dancing Links (Algorithm X).
+#
+# Columns 1..324 are the constraints (cell filled, row has digit, column has
+# digit, box has digit); each of the 729 matrix rows places one digit in one
+# cell and covers exactly four columns. Node 0 is the root header.
+import instrumentation
+from sudoku import flat_cells
+from units import BOX_OF
+
+NUM_COLUMNS = 324
+
+_template = None
+
+
+def _constraint_columns(row, col, num):
+    box = BOX_OF[row * 9 + col]
+    return (
+        1 + row * 9 + col,
+        1 + 81 + row * 9 + num - 1,
+        1 + 162 + col * 9 + num - 1,
+        1 + 243 + box * 9 + num - 1,
+    )
+
+
+def _build_template():
+    # Link layout shared by every solve; each solve works on a copy of the lists
+    left = list(range(-1, NUM_COLUMNS))
+    right = list(range(1, NUM_COLUMNS + 2))
+    left[0], right[NUM_COLUMNS] = NUM_COLUMNS, 0
+    up = list(range(NUM_COLUMNS + 1))
+    down = list(range(NUM_COLUMNS + 1))
+    column = list(range(NUM_COLUMNS + 1))
+    size = [0] * (NUM_COLUMNS + 1)
+    placement = [None] * (NUM_COLUMNS + 1)
+    first_node = {}
+
+    for row in range(9):
+        for col in range(9):
+            for num in range(1, 10):
+                first = len(column)
+                first_node[(row, col, num)] = first
+                for offset, header in enumerate(_constraint_columns(row, col, num)):
+                    node = first + offset
+                    column.append(header)
+                    placement.append((row, col, num))
+                    left.append(first + (offset - 1) % 4)
+                    right.append(first + (offset + 1) % 4)
+                    # Append at the bottom of the column
+                    up.append(up[header])
+                    down.append(header)
+                    down[up[header]] = node
+                    up[header] = node
+                    size[header] += 1
+
+    return left, right, up, down, column, size, placement, first_node
+
+
+class DancingLinks:
+    """Exact-cover search state for a single puzzle."""
+
+    def __init__(self, board):
+        global _template
+        if _template is None:
+            _template = _build_template()
+        left, right, up, down, column, size, placement, first_node = _template
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.size = size[:]
+        self.column = column
+        self.placement = placement
+        self.consistent = True
+        self.givens = []
+        self.nodes = 0  # search nodes visited by search()
+
+        for index, num in enumerate(flat_cells(board)):
+            if num != 0:
+                row, col = divmod(index, 9)
+                self.givens.append((row, col, num))
+                if not self._select(first_node[(row, col, num)]):
+                    self.consistent = False
+                    return
+
+    def _cover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def _is_active(self, header):
+        return self.right[self.left[header]] == header
+
+    def _select(self, node):
+        # Commit to a matrix row outside the search (used for the givens)
+        headers = [self.column[node + offset] for offset in range(4)]
+        if not all(self._is_active(header) for header in headers):
+            return False
+        for header in headers:
+            self._cover(header)
+        return True
+
+    def search(self, max_solutions=1):
+        # Collect up to max_solutions solutions as lists of (row, col, num)
+        solutions = []
+        if self.consistent:
+            self._search([], solutions, max_solutions)
+        return solutions
+
+    def _search(self, partial, solutions, max_solutions):
+        self.nodes += 1
+        right, down, size, column = self.right, self.down, self.size, self.column
+        if right[0] == 0:
+            solutions.append(self.givens + partial)
+            return
+
+        # Branch on the column with the fewest remaining rows
+        header = right[0]
+        best, best_size = header, size[header]
+        while header != 0 and best_size > 1:
+            if size[header] < best_size:
+                best, best_size = header, size[header]
+            header = right[header]
+        if best_size == 0:
+            return
+
+        self._cover(best)
+        i = down[best]
+        while i != best:
+            j = right[i]
+            while j != i:
+                self._cover(column[j])
+                j = right[j]
+            partial.append(self.placement[i])
+            self._search(partial, solutions, max_solutions)
+            partial.pop()
+            j = self.left[i]
+            while j != i:
+                self._uncover(column[j])
+                j = self.left[j]
+            if len(solutions) >= max_solutions:
+                break
+            i = down[i]
+        self._uncover(best)
+
+
+def _search(board, max_solutions):
+    links = DancingLinks(board)
+    solutions = links.search(max_solutions)
+    recorder = instrumentation.active()
+    if recorder is not None:
+        recorder.count("dlx_nodes", links.nodes)
+    return solutions
+
+
+def dlx_solutions(board, max_solutions=1):
+    # Solved grids (lists of lists), stopping once max_solutions are found
+    solutions = []
+    for placements in _search(board, max_solutions):
+        solved = [[0] * 9 for _ in range(9)]
+        for row, col, num in placements:
+            solved[row][col] = num
+        solutions.append(solved)
+    return solutions
+
+
+def has_unique_solution(board):
+    # Stopping at the second solution is enough to tell unique from ambiguous
+    return len(_search(board, max_solutions=2)) == 1
+
+
+def solve_dlx(board):
+    # Same contract as solve_backtracking: fill the board in place, return success
+    solutions = dlx_solutions(board, max_solutions=1)
+    if not solutions:
+        return False
+    for i in range(9):
+        board[i][:] = solutions[0][i]
+    return True
@@ -1,12 +1,18 @@
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
 import numpy as np
+import time
+from functools import lru_cache
+import instrumentation
 from sudoku import SudokuBoard
+from propagation import propagate_board
+from units import UNIT_GETTERS, BOX_OF
+
+
+@lru_cache(maxsize=None)
+def _control_simulation():
+    # The rule base never changes, so it is compiled once per process
 
-def fuzzy_logic_solver(board_string):
-    
-    board = SudokuBoard(board_string)
-    initial_board = [row[:] for row in board.get_board()]
     # Define fuzzy variables
     row_validity = ctrl.Antecedent(np.arange(0, 10, 1), 'row_validity')
     col_validity = ctrl.Antecedent(np.arange(0, 10, 1), 'col_validity')
@@ -59,14 +65,43 @@ def fuzzy_logic_solver(board_string):
 
     # Control system
     cell_ctrl = ctrl.ControlSystem([rule1, rule2, rule3, rule4, rule5, rule6, rule7, rule8, rule9, rule10, rule11, rule12, rule13, rule14, rule15, rule16, rule17, rule18])
-    cell_sim = ctrl.ControlSystemSimulation(cell_ctrl)
+    return ctrl.ControlSystemSimulation(cell_ctrl)
+
 
+@lru_cache(maxsize=None)
+def fuzzy_score(row_validity_score, col_validity_score, box_validity_score):
+    # Defuzzified cell_value for one input triple. The scores are small integers,
+    # so only a few hundred triples ever occur and each is computed once per process.
+    cell_sim = _control_simulation()
+    cell_sim.input['row_validity'] = row_validity_score
+    cell_sim.input['col_validity'] = col_validity_score
+    cell_sim.input['box_validity'] = box_validity_score
+    cell_sim.compute()
+    return cell_sim.output['cell_value']
+
+
+def fuzzy_logic_solver(board, deadline=None):
+    # board: a SudokuBoard or an 81-char string
+    # deadline: optional time.time() value; cells not reached by then are left as they are
+    
+    # Start from the propagated board; fall back to the raw one if it is contradictory
+    propagated = propagate_board(board)
+    if propagated is not None:
+        board, candidates = propagated
+    else:
+        board = SudokuBoard(board)
+        candidates = [[set(range(1, 10)) for _ in range(9)] for _ in range(9)]
+    initial_board = board.get_board()
+    initial_cells = bytes(board.cells)
     # Solve the Sudoku using fuzzy logic
+    cells_filled = 0
     for row in range(9):
+        if deadline is not None and time.time() >= deadline:
+            break
         for col in range(9):
             if initial_board[row][col] == 0:
                 possible_values = []
-                for num in range(1, 10):
+                for num in sorted(candidates[row][col]):
                     if board.is_valid(row, col, num):
                         possible_values.append(num)
 
@@ -75,40 +110,19 @@ def fuzzy_logic_solver(board_string):
                     value_scores = {}
                     for num in possible_values:
                         # Calculate row, column, and box validity
-                        row_violations = 0
-                        for i in range(9):
-                            if initial_board[row][i] == num:
-                                row_violations += 1
-                        row_validity_score = 10 - row_violations
-
-                        col_violations = 0
-                        for i in range(9):
-                            if initial_board[i][col] == num:
-                                col_violations += 1
-                        col_validity_score = 10 - col_violations
-
-                        box_violations = 0
-                        start_row = row - row % 3
-                        start_col = col - col % 3
-                        for i in range(3):
-                            for j in range(3):
-                                if initial_board[start_row + i][start_col + j] == num:
-                                    box_violations += 1
-                        box_validity_score = 10 - box_violations
-
-                        # Pass inputs to the control system
-                        cell_sim.input['row_validity'] = row_validity_score
-                        cell_sim.input['col_validity'] = col_validity_score
-                        cell_sim.input['box_validity'] = box_validity_score
-
-                        # Compute
-                        cell_sim.compute()
+                        row_validity_score = 10 - UNIT_GETTERS[row](initial_cells).count(num)
+                        col_validity_score = 10 - UNIT_GETTERS[9 + col](initial_cells).count(num)
+                        box_validity_score = 10 - UNIT_GETTERS[18 + BOX_OF[row * 9 + col]](initial_cells).count(num)
 
                         # Get the fuzzy output
-                        value_scores[num] = cell_sim.output['cell_value']
+                        value_scores[num] = fuzzy_score(row_validity_score, col_validity_score, box_validity_score)
 
                     # Choose the value with the highest score
                     best_value = max(value_scores, key=value_scores.get)
-                    board.get_board()[row][col] = best_value
+                    board.set(row, col, best_value)
+                    cells_filled += 1
 
+    recorder = instrumentation.active()
+    if recorder is not None:
+        recorder.count("fuzzy_cells_filled", cells_filled)
     return board
@@ -0,0 +1,220 @@
+# Puzzle generator: a random filled grid, then clues removed one at a time in
+# random order, each removal kept only while the puzzle still has exactly one
+# solution. Uniqueness is checked on candidate bitmasks: blanking a cell of a
+# unique puzzle leaves it unique unless the cell can hold a different digit,
+# so a single propagating search with the old digit struck out answers it,
+# and no search has to run on to a second solution. Puzzles come out at a
+# target clue count or difficulty, generated in parallel and streamed in the
+# batch_runner input formats.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from propagation import propagate_masks, propagate_singles, search_masks
+from sudoku import SudokuBoard
+from units import geometry, size_of_cells
+
+# Easiest first: singles alone, every propagation rule, a short search, a long one
+DIFFICULTIES = ("easy", "medium", "hard", "extreme")
+
+# Search nodes a hard puzzle may take; anything beyond is extreme
+HARD_MAX_NODES = 4
+
+# Fresh solutions tried per puzzle before a target is given up on
+MAX_ATTEMPTS = 100
+
+OUTPUT_FORMATS = ("lines", "jsonl", "json")
+
+
+def _has_other_solution(cells, index, grid):
+    # Would blanking cell `index` of a uniquely solvable puzzle let it take another digit?
+    num = cells[index]
+    cells[index] = 0
+    try:
+        masks = propagate_singles(cells, exclude=(index, num))
+        return masks is not None and search_masks(masks, grid.size) is not None
+    finally:
+        cells[index] = num
+
+
+def rate(board):
+    # Difficulty of a uniquely solvable board, one of DIFFICULTIES
+    board = SudokuBoard(board)
+    masks = propagate_singles(board, intersections=False)
+    if all(mask.bit_count() == 1 for mask in masks):
+        return "easy"
+    masks = propagate_masks(board)
+    if all(mask.bit_count() == 1 for mask in masks):
+        return "medium"
+    counts = {"nodes": 0}
+    search_masks(masks, board.size, counts=counts)
+    return "hard" if counts["nodes"] <= HARD_MAX_NODES else "extreme"
+
+
+def random_solution(size, rng):
+    # A random filled grid: the boxes on the diagonal share no unit, so each gets
+    # its own shuffle, and the search completes the rest. On a 4x4 grid some
+    # shuffles cannot be completed; those are drawn again.
+    grid = geometry(size)
+    while True:
+        cells = bytearray(grid.cells)
+        for box in range(0, size, grid.order + 1):
+            for index, num in zip(grid.box_units[box], rng.sample(range(1, size + 1), size)):
+                cells[index] = num
+        masks = propagate_singles(cells)
+        if masks is not None:
+            masks = search_masks(masks, size)
+        if masks is not None:
+            return bytearray(mask.bit_length() - 1 for mask in masks)
+
+
+def dig(solution, rng, clues=None, difficulty=None):
+    """
+    Blank cells of a solved grid in random order while the puzzle stays unique,
+    stopping at `clues` givens. With a difficulty of easy or medium, removals
+    that would make the puzzle harder are undone as well. Returns the cells.
+    """
+    grid = geometry(size_of_cells(len(solution)))
+    cells = bytearray(solution)
+    givens = len(cells)
+    ceiling = DIFFICULTIES.index(difficulty) if difficulty in ("easy", "medium") else None
+    for index in rng.sample(range(len(cells)), len(cells)):
+        if clues is not None and givens <= clues:
+            break
+        if _has_other_solution(cells, index, grid):
+            continue
+        num = cells[index]
+        cells[index] = 0
+        if ceiling is not None and DIFFICULTIES.index(rate(cells)) > ceiling:
+            cells[index] = num
+            continue
+        givens -= 1
+    return cells
+
+
+def generate_puzzle(rng, size=9, clues=None, difficulty=None, max_attempts=MAX_ATTEMPTS):
+    """
+    One uniquely solvable puzzle with exactly `clues` givens and/or the given
+    difficulty, as {"puzzle", "solution", "clues", "difficulty"}. A fresh
+    solution is dug until both targets are met; None after max_attempts.
+    """
+    for _ in range(max_attempts):
+        solution = random_solution(size, rng)
+        cells = dig(solution, rng, clues, difficulty)
+        givens = sum(1 for num in cells if num)
+        if clues is not None and givens != clues:
+            continue
+        rating = rate(cells)
+        if difficulty is not None and rating != difficulty:
+            continue
+        return {
+            "puzzle": SudokuBoard(cells).board_string,
+            "solution": SudokuBoard(solution).board_string,
+            "clues": givens,
+            "difficulty": rating,
+        }
+    return None
+
+
+def generate_chunk(ids, seed, size=9, clues=None, difficulty=None):
+    # Runs in a worker process. Each puzzle has its own seed, so the output
+    # does not depend on how the ids were split between workers.
+    results = []
+    for puzzle_id in ids:
+        record = generate_puzzle(random.Random(f"{seed}:{puzzle_id}"), size, clues, difficulty)
+        results.append({"id": puzzle_id, **record} if record else {"id": puzzle_id, "error": "no puzzle met the target"})
+    return results
+
+
+def generate_puzzles(count, size=9, clues=None, difficulty=None, seed=0, workers=None, chunk_size=16,
+                     max_in_flight=None):
+    """
+    Yield `count` puzzle records, ids 0..count-1, from a process pool, in the
+    order chunks finish. At most max_in_flight chunks are queued at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for start in range(0, count, chunk_size):
+            yield from generate_chunk(range(start, min(start + chunk_size, count)), seed, size, clues, difficulty)
+        return
+    max_in_flight = max_in_flight or workers * 4
+    chunks = iter(range(0, count, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                start = next(chunks, None)
+                if start is None:
+                    exhausted = True
+                    break
+                ids = range(start, min(start + chunk_size, count))
+                pending.add(executor.submit(generate_chunk, ids, seed, size, clues, difficulty))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def write_puzzles(records, out, output_format="lines"):
+    """
+    Write records in a format batch_runner reads: one puzzle per line followed
+    by its clue count and difficulty, JSON Lines, or a JSON list laid out like
+    sudoku_boards.json. Returns (written, failed).
+    """
+    written = failed = 0
+    if output_format == "json":
+        out.write("[")
+    for record in records:
+        if "error" in record:
+            failed += 1
+            continue
+        if output_format == "lines":
+            out.write(f"{record['puzzle']} {record['clues']} {record['difficulty']}\n")
+        elif output_format == "jsonl":
+            out.write(json.dumps(record) + "\n")
+        else:
+            board = SudokuBoard(record["puzzle"]).get_board()
+            out.write(("," if written else "") + "\n  " + json.dumps({"id": record["id"], "board": board,
+                                                                       "difficulty": record["difficulty"]}))
+        written += 1
+    if output_format == "json":
+        out.write("\n]\n")
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate uniquely solvable Sudoku puzzles")
+    parser.add_argument("-n", "--count", type=int, default=10)
+    parser.add_argument("--clues", type=int, default=None, help="givens each puzzle keeps")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default=None)
+    parser.add_argument("--size", type=int, choices=(4, 9, 16), default=9, help="grid side")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="puzzles generated by a worker at a time")
+    parser.add_argument("-o", "--output", default="-", help="where to write puzzles, '-' for stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="lines", dest="output_format")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w')
+    start = time.perf_counter()
+    try:
+        records = generate_puzzles(args.count, args.size, args.clues, args.difficulty, args.seed, args.workers,
+                                   args.chunk_size)
+        written, failed = write_puzzles(records, out, args.output_format)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate_per_sec = written / elapsed if elapsed > 0 else 0.0
+    print(f"Generated {written}/{args.count} puzzles in {elapsed:.2f} seconds ({rate_per_sec:.0f} puzzles/s)",
+          file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
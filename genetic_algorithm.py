@@ -1,119 +1,125 @@
 import random
+import time
+import instrumentation
 from sudoku import SudokuBoard
+from propagation import propagate_board
+from fitness_tracker import FitnessTracker
+from units import count_violations
 
-def generate_population(population_size, board_string):
-    initial_board = SudokuBoard(board_string)
-    initial_values = initial_board.get_board()
+def generate_population(population_size, board, candidates=None):
+    initial_board = SudokuBoard(board)
+    open_cells = [index for index, num in enumerate(initial_board.cells) if num == 0]
     population = []
     for _ in range(population_size):
-        board = [[initial_values[i][j] for j in range(9)] for i in range(9)]
-        # Fill empty cells with random numbers (1-9)
-        for i in range(9):
-            for j in range(9):
-                if board[i][j] == 0:
-                    board[i][j] = random.randint(1, 9)
-                    
-        population.append(SudokuBoard("".join([str(x) for row in board for x in row])))
+        individual = initial_board.copy()
+        cells = individual.cells
+        # Fill empty cells with random numbers from their candidates (1-9 without propagation)
+        for index in open_cells:
+            if candidates:
+                cells[index] = random.choice(sorted(candidates[index // 9][index % 9]))
+            else:
+                cells[index] = random.randint(1, 9)
+
+        population.append(individual)
 
     return population
 
 def calculate_fitness(board):
-    # Calculate the number of constraint violations and penalize empty cells
-    violations = 0
-    empty_cells = 0
-
-    # Check row and column constraints
-    for i in range(9):
-        row_values = set()
-        col_values = set()
-        for j in range(9):
-            val_row = board.get_board()[i][j]
-            val_col = board.get_board()[j][i]
-            if val_row == 0:
-                empty_cells += 1
-            else:
-                if val_row in row_values:
-                    violations += 1
-                row_values.add(val_row)
-            if val_col != 0:
-                if val_col in col_values:
-                    violations += 1
-                col_values.add(val_col)
+    # Calculate the number of constraint violations and penalize empty cells heavily
+    cells = board.cells
+    return -(count_violations(cells) + 10 * cells.count(0))
 
-    # Check 3x3 box constraints
-    for box_row in range(3):
-        for box_col in range(3):
-            box_values = set()
-            for i in range(3):
-                for j in range(3):
-                    row = box_row * 3 + i
-                    col = box_col * 3 + j
-                    val = board.get_board()[row][col]
-                    if val == 0:
-                        continue
-                    if val in box_values:
-                        violations += 1
-                    box_values.add(val)
-
-    # Penalize empty cells heavily
-    return -(violations + 10 * empty_cells)
+def selection_indices(fitnesses, num_parents):
+    # Indices of the fittest individuals, best first; ties go to the earlier individual
+    return sorted(range(len(fitnesses)), key=fitnesses.__getitem__, reverse=True)[:num_parents]
 
 def selection(population, fitnesses, num_parents):
     # Select the best individuals for reproduction
-    parents = []
-    for _ in range(num_parents):
-        max_fitness_idx = fitnesses.index(max(fitnesses))
-        parents.append(population[max_fitness_idx])
-        fitnesses[max_fitness_idx] = float('-inf')  # Ensure the same parent is not selected again
-    return parents
+    return [population[index] for index in selection_indices(fitnesses, num_parents)]
 
-def crossover(parent1, parent2):
-    # Create offspring by combining the genetic material of two parents
-    offspring_board = [[0 for _ in range(9)] for _ in range(9)]
-    for i in range(9):
-        for j in range(9):
-            if random.random() < 0.5:
-                offspring_board[i][j] = parent1.get_board()[i][j]
-            else:
-                offspring_board[i][j] = parent2.get_board()[i][j]
-    return SudokuBoard("".join([str(x) for row in offspring_board for x in row]))
+def crossover(parent1, parent2, tracker=None):
+    # Create offspring by combining the genetic material of two parents. With a copy
+    # of parent1's FitnessTracker, each cell taken from parent2 is applied to it as a delta.
+    offspring = parent1.copy()
+    cells, other = offspring.cells, parent2.cells
+    for index in range(81):
+        if random.random() >= 0.5:
+            cells[index] = other[index]
+            if tracker is not None:
+                tracker.set(index, other[index])
+    return offspring
 
-def mutate(board, mutation_rate, initial_board):
-    # Introduce random changes into the offspring
-    new_board = board.get_board()
-    initial_vals = initial_board.get_board()
-    for i in range(9):
-        for j in range(9):
-            if initial_vals[i][j] == 0 and random.random() < mutation_rate:
-                valid_numbers = [n for n in range(1, 10) if board.is_valid(i, j, n)]
-                if valid_numbers:
-                    new_board[i][j] = random.choice(valid_numbers)
-    board = SudokuBoard("".join([str(x) for row in new_board for x in row]))
+def mutate(board, mutation_rate, initial_board, candidates=None, tracker=None):
+    # Introduce random changes into the offspring (in place). With a FitnessTracker
+    # for the board, validity checks and the fitness update are O(1) per cell.
+    cells = board.cells
+    initial_cells = initial_board.cells
+    for index in range(81):
+        if initial_cells[index] == 0 and random.random() < mutation_rate:
+            i, j = divmod(index, 9)
+            domain = candidates[i][j] if candidates else range(1, 10)
+            if tracker is not None:
+                valid_numbers = [n for n in domain if tracker.is_free(index, n)]
+            else:
+                valid_numbers = [n for n in domain if board.is_valid(i, j, n)]
+            if valid_numbers:
+                cells[index] = random.choice(valid_numbers)
+                if tracker is not None:
+                    tracker.set(index, cells[index])
     return board
 
-def genetic_algorithm(board_string, population_size=100, num_generations=100, mutation_rate=0.1):
-    initial_board = SudokuBoard(board_string)
-    population = generate_population(population_size, board_string)
+def genetic_algorithm(board, population_size=100, num_generations=100, mutation_rate=0.1, deadline=None, seed=None):
+    # board: a SudokuBoard or an 81-char string
+    # deadline: optional time.time() value; the search gives up (returns None) once it passes
+    # seed: optional seed for the module-level random generator, for repeatable runs
+    if seed is not None:
+        random.seed(seed)
+    # Only search the cells that constraint propagation leaves open
+    propagated = propagate_board(board)
+    if propagated is None:
+        return None
+    initial_board, candidates = propagated
+    population = generate_population(population_size, initial_board, candidates)
     if population is None:
         return None
 
+    recorder = instrumentation.active()
+    # One full scan per initial individual; after that every child's tracker is a
+    # parent's tracker updated by the crossover and mutation deltas
+    trackers = [FitnessTracker(board) for board in population]
+    fitnesses = [tracker.fitness() for tracker in trackers]
     for generation in range(num_generations):
-        fitnesses = [calculate_fitness(board) for board in population]
+        if recorder is not None:
+            recorder.count("generations")
+            recorder.count("fitness_evaluations", len(population))
+            best = max(fitnesses)
+            recorder.best_fitness("genetic", best, population[fitnesses.index(best)].cells)
         if max(fitnesses) == 0:
             #   print("Solution found")
             return population[fitnesses.index(max(fitnesses))]
+        if deadline is not None and time.time() >= deadline:
+            break
 
-        parents = selection(population, fitnesses.copy(), population_size // 2)
+        num_parents = population_size // 2
+        chosen = selection_indices(fitnesses, num_parents)
+        parents = [population[index] for index in chosen]
+        parent_trackers = [trackers[index] for index in chosen]
+        parent_fitnesses = [fitnesses[index] for index in chosen]
 
         offspring = []
+        offspring_trackers = []
         while len(offspring) < population_size - len(parents):
-            parent1 = random.choice(parents)
-            parent2 = random.choice(parents)
-            child = crossover(parent1, parent2)
-            child = mutate(child, mutation_rate, initial_board)
+            first = random.randrange(len(parents))
+            second = random.randrange(len(parents))
+            tracker = parent_trackers[first].copy()
+            child = crossover(parents[first], parents[second], tracker)
+            child = mutate(child, mutation_rate, initial_board, candidates, tracker)
             offspring.append(child)
+            offspring_trackers.append(tracker)
 
         population = parents + offspring
+        trackers = parent_trackers + offspring_trackers
+        fitnesses = parent_fitnesses + [tracker.fitness() for tracker in offspring_trackers]
 
     
     return None
@@ -1,112 +1,238 @@
+import time
 import numpy as np
+import instrumentation
 from sudoku import SudokuBoard
-import random
-import multiprocessing
-from concurrent.futures import ThreadPoolExecutor
-
-def calculate_fitness_parallel(board_data):
-    board, idx = board_data
-    violations = 0
-    empty_cells = 0
-    
-    # Check rows and columns
-    for i in range(9):
-        row_values = [0] * 10  # 0-9
-        col_values = [0] * 10
-        for j in range(9):
-            val_row = board[i * 9 + j]
-            val_col = board[j * 9 + i]
-            
-            if val_row == 0:
-                empty_cells += 1
-            else:
-                if row_values[val_row] > 0:
-                    violations += 1
-                row_values[val_row] += 1
-                
-            if val_col != 0:
-                if col_values[val_col] > 0:
-                    violations += 1
-                col_values[val_col] += 1
-    
-    # Check 3x3 boxes
-    for box_row in range(3):
-        for box_col in range(3):
-            box_values = [0] * 10
-            for i in range(3):
-                for j in range(3):
-                    row = box_row * 3 + i
-                    col = box_col * 3 + j
-                    val = board[row * 9 + col]
-                    if val != 0:
-                        if box_values[val] > 0:
-                            violations += 1
-                        box_values[val] += 1
-    
-    return idx, -(violations + 10 * empty_cells)
-
-def parallel_genetic_algorithm(board_string, population_size=500, num_generations=2000, mutation_rate=0.3):
-    # Convert initial board to numpy array
-    initial_board = SudokuBoard(board_string)
-    initial_values = np.array([int(x) for x in board_string], dtype=np.int32)
-    
-    # Generate initial population
-    population = np.zeros((population_size, 81), dtype=np.int32)
-    for i in range(population_size):
-        board = initial_values.copy()
-        empty_cells = np.where(board == 0)[0]
-        board[empty_cells] = np.random.randint(1, 10, size=len(empty_cells))
-        population[i] = board
-    
-    # Get number of CPU cores
-    num_cores = multiprocessing.cpu_count()
-    
+from propagation import propagate_board
+from units import geometry, size_of_cells
+
+# Every function below takes its grid size from the board or population it is
+# given, so the same code runs 9x9, 16x16 and 25x25 boards.
+
+def grid_of(values):
+    # Geometry of a flat board, or of a (population, cells) array
+    return geometry(size_of_cells(values.shape[-1]))
+
+def unit_violations(population, unit_index):
+    # Repeated non-zero digits per board across the given units
+    units = np.sort(population[:, unit_index], axis=2)
+    repeats = (units[:, :, 1:] == units[:, :, :-1]) & (units[:, :, 1:] != 0)
+    return repeats.sum(axis=(1, 2))
+
+def calculate_fitness_batch(population):
+    # Fitness of every board in a (population, cells) array at once: each repeated
+    # digit in a unit is one violation and empty cells cost 10 each
+    violations = unit_violations(population, grid_of(population).unit_index)
+    empty_cells = (population == 0).sum(axis=1)
+    return -(violations + 10 * empty_cells)
+
+def board_to_array(board):
+    # Flat int32 copy of a SudokuBoard's cells
+    return np.frombuffer(board.cells, dtype=np.uint8).astype(np.int32)
+
+def array_to_board(values):
+    return SudokuBoard(values.astype(np.uint8).tobytes())
+
+def candidate_table(initial_values, candidates):
+    # (cells, size) table of allowed digits per cell, padded on the right, plus how many each cell has
+    grid = grid_of(initial_values)
+    table = np.zeros((grid.cells, grid.size), dtype=np.int32)
+    counts = np.ones(grid.cells, dtype=np.int32)
+    for j in range(grid.cells):
+        if initial_values[j] != 0:
+            table[j, 0] = initial_values[j]
+            continue
+        choices = sorted(candidates[j // grid.size][j % grid.size])
+        table[j, :len(choices)] = choices
+        counts[j] = len(choices)
+    return table, counts
+
+def random_candidates(table, counts, shape, rng):
+    # Draw one allowed digit per cell for a (n, cells) block of boards
+    picks = (rng.random(shape) * counts).astype(np.intp)
+    return table[np.arange(shape[-1]), picks]
+
+def evolve_generation(population, fitness_scores, open_cells, table, counts, mutation_rate, rng):
+    population_size = len(population)
+
+    # Selection: keep the fitter half as parents
+    sorted_indices = np.argsort(-fitness_scores, kind='stable')
+    num_parents = population_size // 2
+    parents = population[sorted_indices[:num_parents]]
+
+    # Crossover: one-point crossover between random parent pairs
+    num_offspring = population_size - num_parents
+    first = parents[rng.integers(0, num_parents, num_offspring)]
+    second = parents[rng.integers(0, num_parents, num_offspring)]
+    num_cells = population.shape[1]
+    crossover_points = rng.integers(0, num_cells, size=(num_offspring, 1))
+    offspring = np.where(np.arange(num_cells) < crossover_points, first, second)
+
+    # Mutation: redraw open cells selected by a random mask
+    mutation_mask = (rng.random(offspring.shape) < mutation_rate) & open_cells
+    mutations = random_candidates(table, counts, offspring.shape, rng)
+    offspring = np.where(mutation_mask, mutations, offspring)
+
+    return np.concatenate([parents, offspring])
+
+def parallel_genetic_algorithm(board, population_size=500, num_generations=2000, mutation_rate=0.3, deadline=None,
+                               seed=None):
+    # board: a SudokuBoard or a board string, of any supported size
+    # deadline: optional time.time() value after which the best board so far is returned
+    # seed: optional RNG seed for repeatable runs
+    # Only search the cells that constraint propagation leaves open
+    propagated = propagate_board(board)
+    if propagated is None:
+        return None
+    initial_board, candidates = propagated
+    rng = np.random.default_rng(seed)
+
+    initial_values = board_to_array(initial_board)
+    open_cells = initial_values == 0
+    table, counts = candidate_table(initial_values, candidates)
+
+    # Generate initial population from each open cell's candidates
+    population = random_candidates(table, counts, (population_size, len(initial_values)), rng)
+
+    recorder = instrumentation.active()
     for generation in range(num_generations):
-        # Calculate fitness in parallel
-        with ThreadPoolExecutor(max_workers=num_cores) as executor:
-            fitness_results = list(executor.map(calculate_fitness_parallel, 
-                                             [(population[i], i) for i in range(population_size)]))
-        
-        # Sort results by index and extract fitness scores
-        fitness_results.sort(key=lambda x: x[0])
-        fitness_scores = np.array([score for _, score in fitness_results])
-        
+        if deadline is not None and time.time() >= deadline:
+            break
+        fitness_scores = calculate_fitness_batch(population)
+
         # Check if solution found
-        max_fitness = np.max(fitness_scores)
-        if max_fitness == 0:
-            best_idx = np.argmax(fitness_scores)
-            solution = population[best_idx]
-            return SudokuBoard("".join(map(str, solution)))
-        
-        # Selection
-        sorted_indices = np.argsort(fitness_scores)[::-1]
-        parents = population[sorted_indices[:population_size//2]]
-        
-        # Crossover
-        offspring = np.zeros_like(population)
-        for i in range(0, population_size//2, 2):
-            if i + 1 < len(parents):
-                crossover_point = np.random.randint(0, 81)
-                offspring[i] = np.concatenate([parents[i][:crossover_point], 
-                                            parents[i+1][crossover_point:]])
-                offspring[i+1] = np.concatenate([parents[i+1][:crossover_point], 
-                                              parents[i][crossover_point:]])
-        
-        # Mutation
-        for i in range(population_size//2):
-            for j in range(81):
-                if initial_values[j] == 0 and np.random.random() < mutation_rate:
-                    offspring[i, j] = np.random.randint(1, 10)
-        
-        # Update population
-        population = np.concatenate([parents, offspring])
-    
+        best_idx = np.argmax(fitness_scores)
+        if recorder is not None:
+            recorder.count("generations")
+            recorder.count("fitness_evaluations", len(population))
+            recorder.best_fitness("vectorized_ga", fitness_scores[best_idx], population[best_idx])
+        if fitness_scores[best_idx] == 0:
+            return array_to_board(population[best_idx])
+
+        population = evolve_generation(population, fitness_scores, open_cells, table, counts, mutation_rate, rng)
+
     # Return best solution found
-    with ThreadPoolExecutor(max_workers=num_cores) as executor:
-        fitness_results = list(executor.map(calculate_fitness_parallel, 
-                                         [(population[i], i) for i in range(population_size)]))
-    fitness_results.sort(key=lambda x: x[0])
-    fitness_scores = np.array([score for _, score in fitness_results])
-    best_idx = np.argmax(fitness_scores)
-    solution = population[best_idx]
-    return SudokuBoard("".join(map(str, solution))) 
\ No newline at end of file
+    fitness_scores = calculate_fitness_batch(population)
+    return array_to_board(population[np.argmax(fitness_scores)])
+
+def row_permutation_population(initial_values, candidates, population_size, rng):
+    # Every row gets a random permutation of its missing digits in its open cells,
+    # placing digits where propagation still allows them whenever possible
+    grid = grid_of(initial_values)
+    size = grid.size
+    population = np.tile(initial_values, (population_size, 1))
+    for unit in grid.row_units:
+        open_positions = sorted((j for j in unit if initial_values[j] == 0),
+                                key=lambda j: len(candidates[j // size][j % size]))
+        missing = set(range(1, size + 1)) - set(initial_values[list(unit)].tolist())
+        for individual in population:
+            remaining = set(missing)
+            for j in open_positions:
+                allowed = sorted(remaining & candidates[j // size][j % size]) or sorted(remaining)
+                num = allowed[rng.integers(len(allowed))]
+                individual[j] = num
+                remaining.discard(num)
+    return population
+
+def row_swap_pairs(initial_values):
+    # All (a, b) pairs of open cells that share a row; swapping them keeps the row a permutation
+    pairs = []
+    for unit in grid_of(initial_values).row_units:
+        open_positions = [j for j in unit if initial_values[j] == 0]
+        pairs.extend((a, b) for i, a in enumerate(open_positions) for b in open_positions[i + 1:])
+    return np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+def candidate_allowed(candidates):
+    # allowed[cell, digit]: whether propagation left digit as a candidate for cell
+    size = len(candidates)
+    allowed = np.zeros((size * size, size + 1), dtype=bool)
+    for j in range(size * size):
+        allowed[j, list(candidates[j // size][j % size])] = True
+    return allowed
+
+def calculate_permutation_fitness_batch(population):
+    # Rows are valid by construction, so only column and box conflicts count
+    grid = grid_of(population)
+    return -unit_violations(population, grid.unit_index[grid.size:])
+
+def evolve_permutation_generation(population, fitness_scores, swap_pairs, allowed, mutation_rate, rng):
+    population_size = len(population)
+
+    # Selection: keep the fitter half as parents
+    sorted_indices = np.argsort(-fitness_scores, kind='stable')
+    num_parents = population_size // 2
+    parents = population[sorted_indices[:num_parents]]
+
+    # Crossover: each child row is copied whole from one of two parents
+    num_offspring = population_size - num_parents
+    first = parents[rng.integers(0, num_parents, num_offspring)]
+    second = parents[rng.integers(0, num_parents, num_offspring)]
+    size = grid_of(population).size
+    row_mask = np.repeat(rng.random((num_offspring, size)) < 0.5, size, axis=1)
+    offspring = np.where(row_mask, first, second)
+
+    # Mutation: swap two open cells of the same row, unless that would move a
+    # digit into a cell where the givens already rule it out
+    if len(swap_pairs):
+        mutants = np.flatnonzero(rng.random(num_offspring) < mutation_rate)
+        pairs = swap_pairs[rng.integers(0, len(swap_pairs), len(mutants))]
+        a, b = pairs[:, 0], pairs[:, 1]
+        value_a, value_b = offspring[mutants, a], offspring[mutants, b]
+        keep = allowed[a, value_b] & allowed[b, value_a]
+        mutants, a, b = mutants[keep], a[keep], b[keep]
+        offspring[mutants, a], offspring[mutants, b] = value_b[keep], value_a[keep]
+
+    return np.concatenate([parents, offspring])
+
+def permutation_genetic_algorithm(board, population_size=500, num_generations=500, mutation_rate=0.5, restart_after=40,
+                                  deadline=None, seed=None):
+    # GA over row permutations of the missing digits, with swap mutation and
+    # row-wise crossover, so only column/box conflicts are left to remove.
+    # The population is reseeded around its best board after restart_after
+    # generations without improvement, since it tends to stall on a local optimum.
+    # Past the optional deadline (a time.time() value) the best board so far is returned.
+    propagated = propagate_board(board)
+    if propagated is None:
+        return None
+    initial_board, candidates = propagated
+    rng = np.random.default_rng(seed)
+
+    initial_values = board_to_array(initial_board)
+    swap_pairs = row_swap_pairs(initial_values)
+    population = row_permutation_population(initial_values, candidates, population_size, rng)
+    allowed = candidate_allowed(candidates)
+
+    recorder = instrumentation.active()
+    best_fitness = None
+    stalled = 0
+    for generation in range(num_generations):
+        if deadline is not None and time.time() >= deadline:
+            break
+        fitness_scores = calculate_permutation_fitness_batch(population)
+
+        best_idx = np.argmax(fitness_scores)
+        if recorder is not None:
+            recorder.count("generations")
+            recorder.count("fitness_evaluations", len(population))
+            recorder.best_fitness("permutation_ga", fitness_scores[best_idx], population[best_idx])
+        if fitness_scores[best_idx] == 0:
+            return array_to_board(population[best_idx])
+
+        if best_fitness is None or fitness_scores[best_idx] > best_fitness:
+            best_fitness = fitness_scores[best_idx]
+            stalled = 0
+        else:
+            stalled += 1
+        if stalled >= restart_after:
+            if recorder is not None:
+                recorder.count("restarts")
+            elite = population[best_idx].copy()
+            population = row_permutation_population(initial_values, candidates, population_size, rng)
+            population[0] = elite
+            best_fitness = None
+            stalled = 0
+            continue
+
+        population = evolve_permutation_generation(population, fitness_scores, swap_pairs, allowed, mutation_rate, rng)
+
+    fitness_scores = calculate_permutation_fitness_batch(population)
+    return array_to_board(population[np.argmax(fitness_scores)])
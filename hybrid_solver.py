@@ -1,85 +1,97 @@
 import multiprocessing
-from gpu_genetic_algorithm import parallel_genetic_algorithm
-from fuzzy_logic import fuzzy_logic_solver
-from ant_colony import ant_colony_optimization
+import time
+import instrumentation
+from gpu_genetic_algorithm import permutation_genetic_algorithm
+from island_model import island_genetic_algorithm
+from solver_registry import get_solver
 from sudoku import SudokuBoard
+from units import count_violations
 
-def hybrid_solver(board_string, num_processes=4):
-    # 1. Genetic Algorithm (Parallel)
-    ga_result = parallel_genetic_algorithm(board_string, population_size=500, num_generations=2000, mutation_rate=0.3)
+def refine_solution(board, deadline=None, seed=None):
+    # 2. Fuzzy Logic (Refinement); resolved here so a GA that solves the puzzle never imports skfuzzy
+    with instrumentation.stage("fuzzy"):
+        fl_result = get_solver("fuzzy")(board, deadline=deadline)
+    if fl_result is not None and fl_result.is_solved():
+         return fl_result
+    elif fl_result is not None:
+        board = fl_result
+
+    # 3. Ant Colony Optimization (Optimization)
+    with instrumentation.stage("aco"):
+        aco_result = get_solver("aco")(board, deadline=deadline, seed=seed)
+    if aco_result and aco_result.is_solved():
+        return aco_result
+    elif aco_result:
+         board = aco_result
+
+    return board  # Return the best board found so far, even if not solved
+
+def hybrid_solver(board, num_processes=4, deadline=None, seed=None):
+    # board: a SudokuBoard or an 81-char string
+    # deadline: optional time.time() value; every stage returns its best board once it passes
+    # seed: optional RNG seed passed to the randomized stages
+    board = SudokuBoard(board)
+    # 1. Genetic Algorithm (row-permutation encoding)
+    with instrumentation.stage("permutation_ga"):
+        ga_result = permutation_genetic_algorithm(board, population_size=500, num_generations=500, mutation_rate=0.5,
+                                                  deadline=deadline, seed=seed)
     if ga_result is not None and ga_result.is_solved():
         return ga_result
-    elif ga_result is not None and len(ga_result.get_board()) > 0:
+    elif ga_result is not None:
         board = ga_result
-    else:
-        board = SudokuBoard(board_string)
-
-    if board is not None:
-        # 2. Fuzzy Logic (Refinement)
-        fl_result = fuzzy_logic_solver("".join([str(x) for row in board.get_board() for x in row]))
-        if fl_result is not None and fl_result.is_solved():
-             return fl_result
-        elif fl_result is not None:
-            board = fl_result
 
-        # 3. Ant Colony Optimization (Optimization)
-        aco_result = ant_colony_optimization("".join([str(x) for row in board.get_board() for x in row]))
-        if aco_result and aco_result.is_solved():
-            return aco_result
-        elif aco_result:
-             board = aco_result
+    return refine_solution(board, deadline, seed)
 
-    if board is not None and board.is_solved():
-        return board
-    else:
-        return board  # Return the best board found so far, even if not solved
+def _hybrid_worker(args):
+    board, deadline, seed = args
+    return hybrid_solver(board, deadline=deadline, seed=seed)
 
-def parallel_hybrid_solver(board_string, num_processes=4):
-    board_strings = [board_string] * num_processes
-    with multiprocessing.Pool(processes=num_processes) as pool:
-        results = pool.map(hybrid_solver, board_strings)
+def race_hybrid_solver(board, num_processes=4, deadline=None, seed=None):
+    # Independent hybrid chains in a pool; results are consumed as they finish
+    # and the pool is terminated as soon as one of them is solved
     best_solution = None
-    for result in results:
-        if result and result.is_solved():
-            return result
-        elif result:
-            if best_solution is None:
-                best_solution = result
-            elif calculate_fitness(result) > calculate_fitness(best_solution):
+    with multiprocessing.Pool(processes=num_processes) as pool:
+        # Chain i is seeded with seed + i so the chains do not repeat each other
+        chains = [(board, deadline, None if seed is None else seed + i) for i in range(num_processes)]
+        results = pool.imap_unordered(_hybrid_worker, chains)
+        for _ in range(num_processes):
+            # Every chain stops at the deadline itself; the grace period only covers a stuck worker
+            timeout = None if deadline is None else max(deadline - time.time(), 0) + 5
+            try:
+                result = results.next(timeout=timeout)
+            except multiprocessing.TimeoutError:
+                break
+            if result and result.is_solved():
+                return result
+            if result and (best_solution is None or calculate_fitness(result) > calculate_fitness(best_solution)):
                 best_solution = result
-    if best_solution and best_solution.is_solved():
-        return best_solution
-    elif best_solution:
-        return best_solution
-    else:
-        return None
+    # Leaving the with-block terminates any sibling still running
+    return best_solution
+
+def parallel_hybrid_solver(board, num_processes=4, time_limit=None, mode="islands", seed=None):
+    # board: a SudokuBoard or an 81-char string
+    # time_limit: optional wall-clock budget in seconds for the whole pipeline.
+    # mode "islands" runs one island-model GA across the processes before refining;
+    # mode "race" runs independent hybrid chains and keeps the first one to finish solved.
+    # seed: optional RNG seed passed to the randomized stages
+    deadline = time.time() + time_limit if time_limit is not None else None
+    board = SudokuBoard(board)
+    if mode == "race":
+        # The chains run in pool workers, so only the race as a whole is timed
+        with instrumentation.stage("race"):
+            return race_hybrid_solver(board, num_processes, deadline, seed)
+
+    # 1. Island-model GA: one subpopulation per process with migration, all
+    # islands stop as soon as one of them solves the puzzle
+    with instrumentation.stage("island_ga"):
+        ga_result = island_genetic_algorithm(board, num_islands=num_processes, population_size=500,
+                                             num_generations=500, mutation_rate=0.5, deadline=deadline, seed=seed)
+    if ga_result is not None and ga_result.is_solved():
+        return ga_result
+    if ga_result is not None:
+        board = ga_result
+
+    return refine_solution(board, deadline, seed)
 
 def calculate_fitness(board):
-    violations = 0
-    for i in range(9):
-        row_values = []
-        col_values = []
-        for j in range(9):
-            if board.get_board()[i][j] != 0:
-                if board.get_board()[i][j] in row_values:
-                    violations += 1
-                else:
-                    row_values.append(board.get_board()[i][j])
-            if board.get_board()[j][i] != 0:
-                if board.get_board()[j][i] in col_values:
-                    violations += 1
-                else:
-                    col_values.append(board.get_board()[j][i])
-    for box_row in range(3):
-        for box_col in range(3):
-            box_values = []
-            for i in range(3):
-                for j in range(3):
-                    row = box_row * 3 + i
-                    col = box_col * 3 + j
-                    if board.get_board()[row][col] != 0:
-                        if board.get_board()[row][col] in box_values:
-                            violations += 1
-                        else:
-                            box_values.append(board.get_board()[row][col])
-    return -violations  # Higher fitness is better
+    return -count_violations(board.cells)  # Higher fitness is better
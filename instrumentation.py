@@ -0,0 +1,147 @@
+# Opt-in instrumentation for the solvers: per-stage timers, counters and a
+# best-fitness-over-time trace. Nothing is recorded unless a recording() block
+# is active; solvers fetch the recorder once per call (active()) and skip every
+# hook when it is None, so the disabled cost is a handful of None checks per run.
+#
+# Recording is per process. Work done inside worker processes (island GA
+# islands, race pools, parallel ants) shows up only through what the parent
+# sees: its stage timers and the generation counts the workers report back.
+#
+# A recording can also drive a live view: a listener gets every improved best
+# board as it is found, and a cancel event turns every hook into a point where
+# the solve stops by raising Cancelled.
+import json
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+from sudoku import SudokuBoard
+
+DB_PATH = "sudoku_results.db"
+
+_recorder = None
+_NO_STAGE = nullcontext()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Recorder:
+    __slots__ = ("start", "stages", "counters", "trace", "listener", "cancel_event", "_last_fitness")
+
+    def __init__(self, listener=None, cancel_event=None):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.trace = []
+        self.listener = listener
+        self.cancel_event = cancel_event
+        self._last_fitness = {}
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self.cancel_event is not None:
+            self.check_cancelled()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds, calls = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (seconds + time.perf_counter() - start, calls + 1)
+
+    def best_fitness(self, stage, fitness, cells=None):
+        # Trace point for a stage's best fitness; only changes are kept. cells, the
+        # board behind it, is only read when a listener is attached.
+        fitness = int(fitness)
+        if self._last_fitness.get(stage) != fitness:
+            self._last_fitness[stage] = fitness
+            self.trace.append((round(time.perf_counter() - self.start, 6), stage, fitness))
+            if self.listener is not None and cells is not None:
+                self.listener(stage, fitness, bytes(map(int, cells)))
+        if self.cancel_event is not None:
+            self.check_cancelled()
+
+    def solve_counts(self):
+        # (iterations, search nodes) as stored with a result; None where nothing was counted
+        counters = self.counters
+        iterations = counters.get("generations", 0) + counters.get("aco_iterations", 0) or None
+        nodes = counters.get("backtracking_nodes", 0) + counters.get("dlx_nodes", 0) or None
+        return iterations, nodes
+
+    def to_dict(self):
+        return {
+            "seconds": time.perf_counter() - self.start,
+            "stages": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.stages.items()},
+            "counters": dict(self.counters),
+            "trace": [{"t": t, "stage": stage, "best_fitness": fitness} for t, stage, fitness in self.trace],
+        }
+
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def save_to_db(self, label=None, db_path=DB_PATH):
+        # One row per recording in solve_profiles, the profile itself as JSON
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS solve_profiles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created REAL NOT NULL,
+                    label TEXT,
+                    profile TEXT NOT NULL
+                );
+            """)
+            conn.execute("INSERT INTO solve_profiles (created, label, profile) VALUES (?, ?, ?)",
+                         (time.time(), label, json.dumps(self.to_dict())))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def active():
+    # The current Recorder, or None when instrumentation is off
+    return _recorder
+
+
+def stage(name):
+    # Timer for a pipeline stage; a shared no-op context when nothing is recording
+    if _recorder is None:
+        return _NO_STAGE
+    return _recorder.stage(name)
+
+
+@contextmanager
+def recording(count_is_valid=True, listener=None, cancel_event=None):
+    """
+    Record everything solvers report inside the block and yield the Recorder.
+    With count_is_valid, SudokuBoard.is_valid is wrapped with a call counter
+    for the duration of the block, so it costs nothing the rest of the time.
+    listener(stage, fitness, cells) is called with each improved best board;
+    once cancel_event (a threading or multiprocessing Event) is set, the next
+    hook a solver reaches raises Cancelled.
+    """
+    global _recorder
+    previous, recorder = _recorder, Recorder(listener, cancel_event)
+    original_is_valid = SudokuBoard.is_valid
+    if count_is_valid:
+        def counted_is_valid(board, row, col, num):
+            recorder.count("is_valid_calls")
+            return original_is_valid(board, row, col, num)
+        SudokuBoard.is_valid = counted_is_valid
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+        SudokuBoard.is_valid = original_is_valid
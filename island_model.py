@@ -0,0 +1,148 @@
+import multiprocessing
+import queue
+import time
+import numpy as np
+import instrumentation
+from propagation import propagate_board
+from gpu_genetic_algorithm import (
+    board_to_array,
+    array_to_board,
+    row_permutation_population,
+    row_swap_pairs,
+    candidate_allowed,
+    calculate_permutation_fitness_batch,
+    evolve_permutation_generation,
+)
+
+def _island_worker(island_id, initial_board, candidates, population_size, num_generations, mutation_rate,
+                   migration_interval, num_migrants, restart_after, deadline, seed, inbox, outbox, stop_event, results):
+    # One island: evolves its own row-permutation population and trades its best
+    # boards with the next island in the ring every migration_interval generations
+    inbox.cancel_join_thread()
+    outbox.cancel_join_thread()
+    rng = np.random.default_rng(None if seed is None else seed + island_id)
+    initial_values = board_to_array(initial_board)
+    swap_pairs = row_swap_pairs(initial_values)
+    allowed = candidate_allowed(candidates)
+    population = row_permutation_population(initial_values, candidates, population_size, rng)
+
+    best_fitness = None
+    stalled = 0
+    generation = 0
+    for generation in range(num_generations):
+        if stop_event.is_set() or (deadline is not None and time.time() >= deadline):
+            break
+
+        fitness_scores = calculate_permutation_fitness_batch(population)
+        best_idx = np.argmax(fitness_scores)
+        if fitness_scores[best_idx] == 0:
+            stop_event.set()
+            break
+
+        if generation > 0 and generation % migration_interval == 0:
+            # Emigrate copies of the best boards, immigrants replace the worst
+            order = np.argsort(-fitness_scores, kind='stable')
+            try:
+                outbox.put_nowait(population[order[:num_migrants]].copy())
+            except queue.Full:
+                pass
+            try:
+                while True:
+                    migrants = inbox.get_nowait()
+                    population[order[-len(migrants):]] = migrants
+            except queue.Empty:
+                pass
+            fitness_scores = calculate_permutation_fitness_batch(population)
+            best_idx = np.argmax(fitness_scores)
+
+        if best_fitness is None or fitness_scores[best_idx] > best_fitness:
+            best_fitness = fitness_scores[best_idx]
+            stalled = 0
+        else:
+            stalled += 1
+        if stalled >= restart_after:
+            elite = population[best_idx].copy()
+            population = row_permutation_population(initial_values, candidates, population_size, rng)
+            population[0] = elite
+            best_fitness = None
+            stalled = 0
+            continue
+
+        population = evolve_permutation_generation(population, fitness_scores, swap_pairs, allowed, mutation_rate, rng)
+
+    fitness_scores = calculate_permutation_fitness_batch(population)
+    best_idx = np.argmax(fitness_scores)
+    results.put((island_id, array_to_board(population[best_idx]), int(fitness_scores[best_idx]), generation))
+
+def _next_result(results, deadline, recorder, islands):
+    # Islands report on their own at the deadline; the grace period only covers a dead worker.
+    # Polls every 0.1 s, so a cancel, or every island having exited without reporting
+    # (an exception, an OOM kill), is noticed even when there is no deadline.
+    limit = None if deadline is None else max(deadline, time.time()) + 5
+    while True:
+        if recorder is not None and recorder.cancel_event is not None:
+            recorder.check_cancelled()
+        # Checked before waiting, so anything an island sent before exiting is still read
+        exited = not any(island.is_alive() for island in islands)
+        timeout = 0.1 if limit is None else min(max(limit - time.time(), 0), 0.1)
+        try:
+            return results.get(timeout=timeout)
+        except queue.Empty:
+            if exited or (limit is not None and time.time() >= limit):
+                raise
+
+def island_genetic_algorithm(board, num_islands=4, population_size=500, num_generations=500, mutation_rate=0.5,
+                             migration_interval=20, num_migrants=5, restart_after=40, deadline=None, seed=None):
+    # Island-model GA: each worker process evolves its own subpopulation, migrants
+    # travel around a ring of pipes, and every island stops once any of them
+    # reaches fitness 0 or the optional deadline (a time.time() value) passes.
+    # Island i seeds its RNG with seed + i; migration timing still varies between runs.
+    # Returns the best board found as a SudokuBoard.
+    propagated = propagate_board(board)
+    if propagated is None:
+        return None
+    initial_board, candidates = propagated
+    if 0 not in initial_board.cells:
+        return initial_board
+
+    inboxes = [multiprocessing.Queue(maxsize=2) for _ in range(num_islands)]
+    stop_event = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    islands = []
+    for island_id in range(num_islands):
+        island = multiprocessing.Process(
+            target=_island_worker,
+            args=(island_id, initial_board, candidates, population_size, num_generations, mutation_rate,
+                  migration_interval, num_migrants, restart_after, deadline, seed,
+                  inboxes[island_id], inboxes[(island_id + 1) % num_islands], stop_event, results),
+            daemon=True,
+        )
+        island.start()
+        islands.append(island)
+
+    recorder = instrumentation.active()
+    best_board, best_fitness = None, None
+    try:
+        for _ in range(num_islands):
+            try:
+                _, solution, fitness, generations = _next_result(results, deadline, recorder, islands)
+            except queue.Empty:
+                break
+            if best_fitness is None or fitness > best_fitness:
+                best_board, best_fitness = solution, fitness
+            if recorder is not None:
+                # Islands run in other processes; only their totals come back
+                recorder.count("generations", generations)
+                recorder.count("fitness_evaluations", generations * population_size)
+                recorder.best_fitness("island_ga", best_fitness, best_board.cells)
+            if fitness == 0:
+                stop_event.set()
+                break
+    finally:
+        stop_event.set()
+        for island in islands:
+            island.join(timeout=5)
+            if island.is_alive():
+                island.terminate()
+
+    return best_board
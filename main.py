@@ -1,25 +1,18 @@
-from hybrid_solver import parallel_hybrid_solver
 from sudoku import SudokuBoard
 import time
-import multiprocessing
-from genetic_algorithm import genetic_algorithm
-from fuzzy_logic import fuzzy_logic_solver
-from ant_colony import ant_colony_optimization
-from backtracking_solver import solve_backtracking  # Import the backtracking solver
 import json
 import sys
 import sqlite3
+from contextlib import nullcontext
+import instrumentation
+# Solvers are imported on first use; see solver_registry.py
+from solver_registry import SOLVERS, run_solver, supports
+from portfolio import PORTFOLIO_MODES, portfolio_solve
+from solution_cache import SolutionCache
+from results_store import ResultsStore
 
-def solve_sudoku_hybrid(board):
-    # Solve the Sudoku puzzle using the parallel hybrid solver
-    start_time = time.time()
-    board_string = "".join([str(x) for row in board for x in row])
-    solved_board = parallel_hybrid_solver(board_string)
-    end_time = time.time()
-    if solved_board:
-        solved_board.print_board()
-        print(f"Time taken: {end_time - start_time:.4f} seconds")
-    return solved_board
+# Portfolio choices and outcomes, one JSON object per solve
+PORTFOLIO_LOG = "portfolio_log.jsonl"
 
 def load_board_from_json(file_path, board_index=0):
     
@@ -46,30 +39,29 @@ def load_board_from_json(file_path, board_index=0):
         return None
 
 def initialize_database(db_path="sudoku_results.db"):
-    """Initializes the SQLite database and creates the results table if it doesn't exist."""
-    conn = None
+    """Opens the results store, creating or upgrading the results table as needed. Returns None on error."""
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS solve_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                puzzle_id INTEGER,
-                puzzle_string TEXT NOT NULL,
-                time_taken REAL NOT NULL
-            );
-        """)
-        conn.commit()
+        store = ResultsStore(db_path)
         print("Database initialized successfully.")
+        return store
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+        return None
 
 if __name__ == "__main__":
+    # Batch mode: python main.py --batch <file|-> [options]; see batch_runner.py --help
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        from batch_runner import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
+    # --profile records per-stage timings, counters and a best-fitness trace for
+    # the solve, prints them as JSON and saves them to the solve_profiles table
+    profile = "--profile" in sys.argv
+    if profile:
+        sys.argv.remove("--profile")
+
     # Initialize the database
-    initialize_database()
+    results_store = initialize_database()
 
     json_file_path = "sudoku_boards.json"
     selected_board_index = 0 # Default to the first board
@@ -80,53 +72,63 @@ if __name__ == "__main__":
             print("Error: Invalid board index provided. Using the first board (index 0).")
             selected_board_index = 0
 
+    # "auto" picks a backend from the puzzle's features, "race" runs several at once;
+    # any registry name runs that backend alone
+    solver_name = "auto"
+    if len(sys.argv) > 2:
+        if sys.argv[2] in PORTFOLIO_MODES or sys.argv[2] in SOLVERS:
+            solver_name = sys.argv[2]
+        else:
+            print(f"Error: Unknown solver '{sys.argv[2]}'. "
+                  f"Available: {', '.join(PORTFOLIO_MODES + tuple(SOLVERS))}. Using auto.")
+
     result = load_board_from_json(json_file_path, selected_board_index)
     if result is None:
         exit() # Exit if board loading failed
     puzzle_id, board = result
+    if solver_name in SOLVERS and not supports(solver_name, len(board)):
+        print(f"Error: Solver '{solver_name}' cannot solve {len(board)}x{len(board)} boards.")
+        exit()
 
     print(f"Initial Sudoku Board (ID: {puzzle_id}):")
-    SudokuBoard("".join([str(x) for row in board for x in row])).print_board()
+    SudokuBoard(board).print_board()
     print("-" * 25)
     print("generating please wait....")
 
-    # BT
-    board_copy = [row[:] for row in board]  
-    start_time = time.time()
-    
+    with instrumentation.recording() if profile else nullcontext() as recorder:
+        if solver_name in PORTFOLIO_MODES:
+            with SolutionCache() as cache:
+                solved_board, stats = portfolio_solve(board, mode=solver_name, log_path=PORTFOLIO_LOG, cache=cache)
+        else:
+            solved_board, stats = run_solver(solver_name, board)
+
+    if recorder is not None:
+        stats["iterations"], stats["nodes"] = recorder.solve_counts()
+        print(recorder.to_json())
+        recorder.save_to_db(label=f"{puzzle_id}:{solver_name}")
+
     solved_board_data = None
-    time_elapsed = 0
+    time_elapsed = stats["seconds"]
 
-    if solve_backtracking(board_copy):
-        solved_board_data = board_copy
-        time_elapsed = time.time() - start_time
-        SudokuBoard("".join([str(x) for row in solved_board_data for x in row])).print_board()
+    if stats["solved"]:
+        solved_board_data = solved_board.get_board()
+        solved_board.print_board()
+        print(f"Solved by {stats['solver']}")
         print(f"Time taken : {time_elapsed:.4f} seconds")
+        if stats["solver"] == "dlx":
+            from dlx_solver import has_unique_solution
+            print("Solution is unique" if has_unique_solution(board) else "Puzzle has more than one solution")
+    elif solved_board is not None:
+        print("No solution found, best board reached:")
+        solved_board.print_board()
     else:
-       #
-        print("Backtracking failed, trying hybrid solver...")
-        start_time_hybrid = time.time()
-        solved_board_data_hybrid = solve_sudoku_hybrid(board)
-        time_elapsed_hybrid = time.time() - start_time_hybrid
-        if solved_board_data_hybrid:
-             solved_board_data = [list(map(int,list(solved_board_data_hybrid.board_string[i:i+9]))) for i in range(0,81,9)]
-             time_elapsed = time_elapsed_hybrid
+        print("No solution found.")
 
     # Save results to database if a board was solved
-    if solved_board_data:
-        db_path = "sudoku_results.db"
-        conn = None
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            puzzle_string = "".join([str(x) for row in board for x in row])
-            time_elapsed_str = "{:.3f}".format(time_elapsed)
-            cursor.execute("INSERT INTO solve_results (puzzle_id, puzzle_string, time_taken) VALUES (?, ?, ?)",
-                           (puzzle_id, puzzle_string, time_elapsed_str))
-            conn.commit()
-            print("Results saved to database.")
-        except sqlite3.Error as e:
-            print(f"Database error while saving results: {e}")
-        finally:
-            if conn:
-                conn.close()
+    if solved_board_data and results_store is not None:
+        results_store.record(puzzle_id, SudokuBoard(board).board_string, time_elapsed,
+                             solution=SudokuBoard(solved_board_data).board_string, solver=stats["solver"],
+                             iterations=stats.get("iterations"), nodes=stats.get("nodes"))
+        print("Results saved to database.")
+    if results_store is not None:
+        results_store.close()
@@ -0,0 +1,143 @@
+# Portfolio dispatch over the solver registry: pick a backend from cheap puzzle
+# features, or race several in parallel and keep the first solved board. Every
+# decision can be appended to a JSON Lines log to tune the policy later.
+import json
+import math
+import time
+from propagation import propagate_masks
+from solver_registry import EXACT_SOLVERS, run_solver, supports
+from sudoku import SudokuBoard
+
+PORTFOLIO_MODES = ("auto", "race")
+
+# Tried after a heuristic choice fails, to return the best partial board, for at
+# most FALLBACK_SECONDS. An exact backend that fails has proven there is no
+# solution, so it gets no fallback.
+FALLBACK_SOLVER = "hybrid"
+FALLBACK_SECONDS = 10.0
+
+# Backends that solve a 9x9 puzzle faster than its canonical form can be worked
+# out; before these the cache only looks for exact repeats
+FAST_SOLVERS = ("backtracking", "dlx")
+
+# Backends raced by default. Pool workers cannot start processes of their own,
+# so the hybrid and island solvers cannot take part in a race.
+RACE_SOLVERS = ("backtracking", "dlx", "permutation_ga")
+
+
+def puzzle_features(board):
+    # Cheap features: clue count, what propagation alone achieves, and the
+    # candidate entropy (sum of log2 candidate counts) it leaves behind
+    board = SudokuBoard(board)
+    features = {"size": board.size, "clues": len(board.cells) - board.cells.count(0)}
+    masks = propagate_masks(board)
+    if masks is None:
+        features.update(propagation="contradiction", open_cells=0, entropy=0.0)
+        return features
+    counts = [mask.bit_count() for mask in masks if mask.bit_count() > 1]
+    features.update(propagation="open" if counts else "solved", open_cells=len(counts),
+                    entropy=round(sum(math.log2(count) for count in counts), 3))
+    return features
+
+
+def choose_solver(features):
+    # DLX was fastest on every solvable puzzle we measured, whatever the clue count or
+    # entropy. A contradiction is proven by the backtracker's propagation pass alone,
+    # where DLX may have to search before it runs out of rows.
+    # DLX only covers 9x9 grids.
+    if features["propagation"] == "contradiction" or not supports("dlx", features["size"]):
+        return "backtracking"
+    return "dlx"
+
+
+def _race_worker(args):
+    name, board_string, deadline = args
+    result, stats = run_solver(name, board_string, deadline)
+    return (result.board_string if result is not None else None), stats
+
+
+def race_solvers(board, solvers=RACE_SOLVERS, deadline=None):
+    # Run the backends side by side; returns (first solved board or best effort, attempt stats)
+    import multiprocessing  # only racing needs it; keeps the CLI's fast path lean
+    board = SudokuBoard(board)
+    board_string = board.board_string
+    solvers = [name for name in solvers if supports(name, board.size)]
+    best, attempts = None, []
+    with multiprocessing.Pool(processes=len(solvers)) as pool:
+        results = pool.imap_unordered(_race_worker, [(name, board_string, deadline) for name in solvers])
+        for _ in solvers:
+            timeout = None if deadline is None else max(deadline - time.time(), 0) + 5
+            try:
+                result, stats = results.next(timeout=timeout)
+            except multiprocessing.TimeoutError:
+                break
+            attempts.append(stats)
+            if result is not None and (best is None or stats["solved"]):
+                best = SudokuBoard(result)
+            if stats["solved"]:
+                break
+    # Leaving the with-block terminates the backends still running
+    return best, attempts
+
+
+def _log_decision(stats, log_path):
+    if log_path is not None:
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(stats) + "\n")
+
+
+def portfolio_solve(board, deadline=None, mode="auto", log_path=None, cache=None):
+    """
+    Solve board with the portfolio. mode "auto" runs the backend chosen from the
+    puzzle features, falling back to FALLBACK_SOLVER only when a heuristic
+    choice fails; mode "race" runs
+    RACE_SOLVERS in parallel. With a SolutionCache, repeats of solved puzzles
+    are answered from it without running a solver, and so are symmetric
+    variants unless the chosen backend is one of FAST_SOLVERS.
+    Returns (SudokuBoard or None, stats).
+    """
+    start = time.perf_counter()
+    if cache is not None and SudokuBoard(board).size != 9:
+        cache = None  # canonical forms are only defined for 9x9 grids
+    cached = form = features = None
+    if cache is not None:
+        cached, form = cache.get(board, symmetric=False)
+    if cached is None:
+        features = puzzle_features(board)
+        choice = "race" if mode == "race" else choose_solver(features)
+        symmetric = choice not in FAST_SOLVERS
+        if cache is not None and symmetric:
+            cached, form = cache.get(board)
+    if cached is not None:
+        stats = {"mode": mode, "choice": "cache", "features": features, "attempts": [], "solver": "cache",
+                 "solved": True, "seconds": time.perf_counter() - start}
+        _log_decision(stats, log_path)
+        return cached, stats
+
+    if choice == "race":
+        result, attempts = race_solvers(board, deadline=deadline)
+    else:
+        result, stats = run_solver(choice, board, deadline)
+        attempts = [stats]
+        if not stats["solved"] and choice not in EXACT_SOLVERS and supports(FALLBACK_SOLVER, features["size"]):
+            fallback_deadline = min(math.inf if deadline is None else deadline, time.time() + FALLBACK_SECONDS)
+            if time.time() < fallback_deadline:
+                candidate, stats = run_solver(FALLBACK_SOLVER, board, fallback_deadline)
+                attempts.append(stats)
+                if candidate is not None:
+                    result = candidate
+
+    solved = [stats["solver"] for stats in attempts if stats["solved"]]
+    stats = {
+        "mode": mode,
+        "choice": choice,
+        "features": features,
+        "attempts": attempts,
+        "solver": solved[0] if solved else None,
+        "solved": bool(solved),
+        "seconds": time.perf_counter() - start,
+    }
+    if cache is not None and solved:
+        cache.put(board, result, form, symmetric)
+    _log_decision(stats, log_path)
+    return result, stats
@@ -0,0 +1,246 @@
+from functools import lru_cache
+from itertools import combinations
+import time
+import instrumentation
+from constraint_engine import digit_mask, mask_digits
+from sudoku import SudokuBoard, flat_cells
+from units import geometry, size_of_cells
+
+
+# Search nodes between deadline checks in solutions_masks
+DEADLINE_CHECK_NODES = 16
+
+
+class Contradiction(Exception):
+    pass
+
+
+def _assign(masks, peers, index, num):
+    # Fix a cell to num and push the consequence to its peers (naked singles)
+    bit = 1 << num
+    if not masks[index] & bit:
+        raise Contradiction
+    masks[index] = bit
+    for peer in peers[index]:
+        _eliminate(masks, peers, peer, bit)
+
+
+def _eliminate(masks, peers, index, bits):
+    mask = masks[index]
+    if not mask & bits:
+        return False
+    mask &= ~bits
+    if mask == 0:
+        raise Contradiction
+    masks[index] = mask
+    if mask.bit_count() == 1:
+        for peer in peers[index]:
+            _eliminate(masks, peers, peer, mask)
+    return True
+
+
+def _hidden_singles(masks, grid):
+    full = digit_mask(grid.size)
+    changed = False
+    for unit in grid.units:
+        # Digits seen in at least one and in at least two cells of the unit
+        once = twice = 0
+        for i in unit:
+            twice |= once & masks[i]
+            once |= masks[i]
+        if once != full:
+            raise Contradiction
+        singles = once & ~twice
+        if not singles:
+            continue
+        for i in unit:
+            hit = masks[i] & singles
+            if hit and masks[i] != hit:
+                if hit.bit_count() > 1:
+                    # One cell is the only place for two digits
+                    raise Contradiction
+                _assign(masks, grid.peers, i, hit.bit_length() - 1)
+                changed = True
+    return changed
+
+
+def _naked_subsets(masks, grid, max_size=3):
+    # Naked pairs/triples: k open cells of a unit sharing k digits between them
+    changed = False
+    for unit in grid.units:
+        for size in range(2, max_size + 1):
+            open_cells = [i for i in unit if 1 < masks[i].bit_count() <= size]
+            for group in combinations(open_cells, size):
+                union = 0
+                for i in group:
+                    union |= masks[i]
+                if union.bit_count() != size:
+                    continue
+                for i in unit:
+                    if i not in group and _eliminate(masks, grid.peers, i, union):
+                        changed = True
+    return changed
+
+
+@lru_cache(maxsize=None)
+def _segments(size):
+    # Every box/line intersection as (segment cells, rest of the box, rest of the line)
+    grid = geometry(size)
+    segments = []
+    for box in grid.box_units:
+        for line_of, lines in ((grid.row_of, grid.row_units), (grid.col_of, grid.col_units)):
+            for line in sorted({line_of[i] for i in box}):
+                segment = tuple(i for i in box if line_of[i] == line)
+                segments.append((segment, tuple(i for i in box if i not in segment),
+                                 tuple(i for i in lines[line] if i not in segment)))
+    return tuple(segments)
+
+
+def _intersections(masks, grid):
+    # Pointing: a digit confined to one row/column of a box leaves the rest of that line.
+    # Claiming: a digit confined to one box within a line leaves the rest of that box.
+    changed = False
+    for segment, rest_of_box, rest_of_line in _segments(grid.size):
+        inside = 0
+        for i in segment:
+            inside |= masks[i]
+        box_elsewhere = line_elsewhere = 0
+        for i in rest_of_box:
+            box_elsewhere |= masks[i]
+        for i in rest_of_line:
+            line_elsewhere |= masks[i]
+        pointing = inside & ~box_elsewhere & line_elsewhere
+        if pointing:
+            for i in rest_of_line:
+                if _eliminate(masks, grid.peers, i, pointing):
+                    changed = True
+        claiming = inside & ~line_elsewhere & box_elsewhere
+        if claiming:
+            for i in rest_of_box:
+                if _eliminate(masks, grid.peers, i, claiming):
+                    changed = True
+    return changed
+
+
+def propagate_singles(board, exclude=None, intersections=True):
+    """
+    Candidate masks after naked and hidden singles, plus box/line intersections
+    unless intersections=False: the cheap part of propagate_masks, for callers
+    that propagate many boards. exclude=(index, num) strikes num from that cell
+    first. None if the board is contradictory.
+    """
+    values = flat_cells(board)
+    grid = geometry(size_of_cells(len(values)))
+    masks = [digit_mask(grid.size)] * grid.cells
+    try:
+        if exclude is not None:
+            index, num = exclude
+            masks[index] &= ~(1 << num)
+        for index, num in enumerate(values):
+            if num != 0:
+                _assign(masks, grid.peers, index, num)
+        while _hidden_singles(masks, grid) or (intersections and _intersections(masks, grid)):
+            pass
+    except Contradiction:
+        return None
+    return masks
+
+
+def propagate_masks(board):
+    """Candidate bitmask per cell after propagation, or None if the puzzle is contradictory."""
+    values = flat_cells(board)
+    grid = geometry(size_of_cells(len(values)))
+    masks = [digit_mask(grid.size)] * grid.cells
+    try:
+        for index, num in enumerate(values):
+            if num != 0:
+                _assign(masks, grid.peers, index, num)
+        while True:
+            if _hidden_singles(masks, grid):
+                continue
+            if _naked_subsets(masks, grid):
+                continue
+            if not _intersections(masks, grid):
+                break
+    except Contradiction:
+        return None
+    return masks
+
+
+def search_masks(masks, size, deadline=None, counts=None):
+    """
+    Depth-first search over candidate masks that propagates naked and hidden
+    singles after every guess, for grids where plain backtracking thrashes.
+    Returns the solved masks (one bit per cell) or None, also once deadline
+    (a time.time() value) has passed. Iterative, so the search depth is not
+    bounded by the recursion limit on large grids. With a counts dict, the
+    nodes searched are added to counts["nodes"].
+    """
+    grid = geometry(size)
+    recorder = instrumentation.active()
+    stack = [(masks, None, 0)]
+    nodes = 0
+    while stack:
+        nodes += 1
+        if deadline is not None and nodes % DEADLINE_CHECK_NODES == 0 and time.time() >= deadline:
+            return None
+        masks, index, num = stack.pop()
+        if index is not None:
+            masks = list(masks)
+            try:
+                _assign(masks, grid.peers, index, num)
+                while _hidden_singles(masks, grid) or _intersections(masks, grid):
+                    pass
+            except Contradiction:
+                continue
+        if recorder is not None:
+            recorder.count("backtracking_nodes")
+        if counts is not None:
+            counts["nodes"] = counts.get("nodes", 0) + 1
+        best_index, best_count = None, size + 1
+        for i, mask in enumerate(masks):
+            count = mask.bit_count()
+            if 1 < count < best_count:
+                best_index, best_count = i, count
+                if count == 2:
+                    break
+        if best_index is None:
+            return masks
+        # Pushed in reverse so the lowest digit is tried first
+        for digit in reversed(mask_digits(masks[best_index])):
+            stack.append((masks, best_index, digit))
+    return None
+
+
+def _fixed_digit(mask):
+    # The digit of a single-candidate mask, 0 for an open cell
+    return mask.bit_length() - 1 if mask.bit_count() == 1 else 0
+
+
+def _candidate_sets(masks, size):
+    return [[set(mask_digits(masks[r * size + c])) for c in range(size)] for r in range(size)]
+
+
+def propagate(board):
+    """
+    Reduce candidate domains with naked/hidden singles, naked pairs/triples and
+    pointing/claiming. Returns (partially filled board, per-cell candidate sets),
+    or None when the givens lead to a contradiction.
+    """
+    masks = propagate_masks(board)
+    if masks is None:
+        return None
+    size = size_of_cells(len(masks))
+    filled = [[_fixed_digit(masks[r * size + c]) for c in range(size)] for r in range(size)]
+    return filled, _candidate_sets(masks, size)
+
+
+def propagate_board(board):
+    # Same as propagate, but takes and returns a SudokuBoard (or takes an 81-char string)
+    if isinstance(board, str):
+        board = SudokuBoard(board)
+    masks = propagate_masks(board)
+    if masks is None:
+        return None
+    filled = SudokuBoard(bytes(_fixed_digit(mask) for mask in masks))
+    return filled, _candidate_sets(masks, size_of_cells(len(masks)))
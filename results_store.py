@@ -0,0 +1,95 @@
+import queue
+import sqlite3
+import threading
+
+DB_PATH = "sudoku_results.db"
+
+# Columns added after the original (puzzle_id, puzzle_string, time_taken) schema
+EXTRA_COLUMNS = {
+    "solution": "TEXT",
+    "solver": "TEXT",
+    "iterations": "INTEGER",
+    "nodes": "INTEGER",
+}
+
+INSERT_RESULT = """
+    INSERT INTO solve_results (puzzle_id, puzzle_string, time_taken, solution, solver, iterations, nodes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def initialize_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS solve_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            puzzle_id INTEGER,
+            puzzle_string TEXT NOT NULL,
+            time_taken REAL NOT NULL
+        );
+    """)
+    # Older databases only have the original columns
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(solve_results)")}
+    for name, column_type in EXTRA_COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE solve_results ADD COLUMN {name} {column_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS solve_results_puzzle_id ON solve_results (puzzle_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS solve_results_puzzle_string ON solve_results (puzzle_string)")
+    conn.commit()
+
+
+class ResultsStore:
+    """
+    Writes solve_results rows through one long-lived connection. record() only
+    queues the row; a background thread inserts whatever has queued up in one
+    transaction, so a burst of results costs one commit instead of one per row.
+    The database runs in WAL mode with synchronous=NORMAL, which skips the
+    fsync on every commit.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=1000):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        initialize_schema(self.conn)
+        self.writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self.writer.start()
+
+    def record(self, puzzle_id, puzzle_string, time_taken, solution=None, solver=None, iterations=None, nodes=None):
+        self.queue.put((puzzle_id, puzzle_string, round(time_taken, 3), solution, solver, iterations, nodes))
+
+    def flush(self):
+        # Block until every queued row is committed
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            stopping = len(rows) < len(batch)
+            if rows:
+                try:
+                    with self.conn:
+                        self.conn.executemany(INSERT_RESULT, rows)
+                except sqlite3.Error as e:
+                    print(f"Database error while saving results: {e}")
+            for _ in batch:
+                self.queue.task_done()
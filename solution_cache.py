@@ -0,0 +1,250 @@
+# Solution cache keyed by a puzzle's canonical form under the Sudoku symmetry
+# group: digit relabelings, band and row-within-band permutations, stack and
+# column-within-stack permutations, and transposition. Every variant of a
+# cached puzzle is answered by mapping the stored solution back to the
+# caller's orientation.
+import sqlite3
+import time
+from itertools import permutations, product
+from operator import itemgetter
+from sudoku import SudokuBoard
+
+DB_PATH = "sudoku_results.db"
+
+# The 1296 column orders that keep the stack structure
+COLUMN_ORDERS = tuple(
+    tuple(stack * 3 + offset for stack in stack_order for offset in offsets[stack])
+    for stack_order in permutations(range(3))
+    for offsets in product(permutations(range(3)), repeat=3)
+)
+COLUMN_GETTERS = tuple(itemgetter(*cols) for cols in COLUMN_ORDERS)
+
+# Maps every digit to 1, leaving blanks at 0
+_FILLED = bytes.maketrans(bytes(range(1, 10)), b'\x01' * 9)
+
+# Candidate transforms kept while building the minimal form; past this the
+# puzzle is too symmetric (or too empty) to canonicalise cheaply
+TIE_CAP = 2000
+
+
+def _transpose(cells):
+    return bytes(cells[col * 9 + row] for row in range(9) for col in range(9))
+
+
+def _relabel(values, mapping):
+    # Digits are renamed 1, 2, 3... in order of first appearance; blanks stay 0
+    for num in values:
+        if num and num not in mapping:
+            mapping[num] = len(mapping) + 1
+    return tuple([mapping.get(num, 0) for num in values])
+
+
+def _next_rows(rows):
+    # Source rows allowed at the next output row without breaking the band structure
+    if len(rows) % 3 == 0:
+        used_bands = {row // 3 for row in rows}
+        return [row for row in range(9) if row // 3 not in used_bands]
+    band = rows[-1] // 3
+    return [row for row in range(band * 3, band * 3 + 3) if row not in rows]
+
+
+def _row_options(values):
+    """
+    Smallest relabelling of one row, with no digits labelled yet, over every
+    column order: (labels, [(cols, mapping), ...]) for the orders that reach it.
+    """
+    digits = [num for num in values if num]
+    if len(digits) == len(set(digits)):
+        # Without repeated digits the relabelled row is fixed by where its blanks
+        # fall, so only the orders with the smallest blank pattern can win, and
+        # they all relabel to the same row
+        pattern = values.translate(_FILLED)
+        patterns = [getter(pattern) for getter in COLUMN_GETTERS]
+        least = min(patterns)
+        orders = [cols for cols, found in zip(COLUMN_ORDERS, patterns) if found == least]
+        labels = _relabel([values[col] for col in orders[0]], {})
+        options = []
+        for cols in orders:
+            ordered = [values[col] for col in cols if values[col]]
+            options.append((cols, {num: i + 1 for i, num in enumerate(ordered)}))
+        return labels, options
+    best, options = None, []
+    for cols in COLUMN_ORDERS:
+        mapping = {}
+        labels = _relabel([values[col] for col in cols], mapping)
+        if best is None or labels < best:
+            best, options = labels, []
+        if labels == best:
+            options.append((cols, mapping))
+    return best, options
+
+
+def canonical_form(board):
+    """
+    Return (key, transform) for board. key is the lexicographically smallest
+    relabelled 81-char string over the symmetry group; transform is
+    (transposed, rows, cols, mapping) taking board to it. If more than
+    TIE_CAP partial transforms tie, the key falls back to the board itself
+    with only its digits relabelled (prefixed "raw:"), which is still a
+    deterministic key, just without symmetry sharing.
+    """
+    cells = bytes(SudokuBoard(board).cells)
+    grids = (cells, _transpose(cells))
+    blank = (0,) * 9
+
+    # A state is (transposed, rows, cols, mapping). While every row placed so far
+    # is blank, any column order gives the same prefix, so cols stays None until
+    # the first row with a digit picks the orders; a blank line is one state
+    # instead of 1296 tied ones.
+    states = [(transposed, (), None, {}) for transposed in range(2)]
+    key = []
+    for _ in range(9):
+        best, next_states = None, []
+        for transposed, rows, cols, mapping in states:
+            grid = grids[transposed]
+            for row in (_next_rows(rows) if rows else range(9)):
+                values = grid[row * 9:row * 9 + 9]
+                if cols is None:
+                    if any(values):
+                        labels, options = _row_options(values)
+                    else:
+                        labels, options = blank, [(None, mapping)]
+                    if best is not None and labels > best:
+                        continue
+                    if best is None or labels < best:
+                        best, next_states = labels, []
+                    next_states.extend((transposed, rows + (row,), row_cols, row_mapping)
+                                       for row_cols, row_mapping in options)
+                else:
+                    row_mapping = dict(mapping)
+                    labels = _relabel([values[col] for col in cols], row_mapping)
+                    if best is None or labels < best:
+                        best, next_states = labels, []
+                    if labels == best:
+                        next_states.append((transposed, rows + (row,), cols, row_mapping))
+                if len(next_states) > TIE_CAP:
+                    return _raw_form(cells)
+        key.extend(best)
+        states = next_states
+
+    transposed, rows, cols, mapping = states[0]
+    # An all-blank board never fixes its columns
+    return "".join(map(str, key)), (transposed, rows, cols or tuple(range(9)), mapping)
+
+
+def _raw_form(cells):
+    mapping = {}
+    labels = _relabel(cells, mapping)
+    return "raw:" + "".join(map(str, labels)), (0, tuple(range(9)), tuple(range(9)), mapping)
+
+
+def _full_mapping(mapping):
+    # Give digits absent from the puzzle the remaining labels, in ascending order
+    mapping = dict(mapping)
+    for num in range(1, 10):
+        if num not in mapping:
+            mapping[num] = len(mapping) + 1
+    return mapping
+
+
+def to_canonical(solution, transform):
+    transposed, rows, cols, mapping = transform
+    cells = bytes(SudokuBoard(solution).cells)
+    grid = _transpose(cells) if transposed else cells
+    mapping = _full_mapping(mapping)
+    return bytes(mapping[grid[row * 9 + col]] for row in rows for col in cols)
+
+
+def from_canonical(canonical_cells, transform):
+    # Inverse of to_canonical: put a canonical solution back in the caller's orientation
+    transposed, rows, cols, mapping = transform
+    inverse = {label: num for num, label in _full_mapping(mapping).items()}
+    grid = bytearray(81)
+    for k, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            grid[row * 9 + col] = inverse[canonical_cells[k * 9 + j]]
+    return SudokuBoard(_transpose(grid) if transposed else grid)
+
+
+class SolutionCache:
+    """
+    Canonical puzzle -> canonical solution, in SQLite with least-recently-used
+    eviction, through one long-lived connection. Every solved puzzle is also
+    stored under its exact board string, so a repeat is answered without
+    computing the canonical form.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_entries=10000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS solution_cache (
+                canonical TEXT PRIMARY KEY,
+                solution TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS solution_cache_last_used ON solution_cache (last_used);")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fetch(self, key):
+        row = self.conn.execute("SELECT solution FROM solution_cache WHERE canonical = ?", (key,)).fetchone()
+        if row is not None:
+            self.conn.execute("UPDATE solution_cache SET last_used = ?, hits = hits + 1 WHERE canonical = ?",
+                              (time.time(), key))
+            self.conn.commit()
+        return row and row[0]
+
+    def get(self, board, symmetric=True):
+        """
+        Look board up by its exact string, then, if symmetric, by its canonical
+        form. Returns (solved SudokuBoard in the caller's orientation or None,
+        form); form is the (key, transform) computed on the way, or None, and
+        is meant for put() so a miss is canonicalised only once.
+        """
+        board = SudokuBoard(board)
+        exact = "exact:" + board.board_string
+        solution = self._fetch(exact)
+        if solution is not None:
+            return SudokuBoard(solution), None
+        if not symmetric:
+            return None, None
+        form = canonical_form(board)
+        solution = self._fetch(form[0])
+        if solution is None:
+            return None, form
+        solved = from_canonical(SudokuBoard(solution).cells, form[1])
+        self._store([(exact, solved.board_string)])
+        return solved, form
+
+    def put(self, board, solution, form=None, symmetric=True):
+        # Store under the exact board string and, if symmetric, the canonical form
+        board = SudokuBoard(board)
+        entries = [("exact:" + board.board_string, SudokuBoard(solution).board_string)]
+        if symmetric:
+            key, transform = form or canonical_form(board)
+            entries.append((key, SudokuBoard(to_canonical(solution, transform)).board_string))
+        self._store(entries)
+
+    def _store(self, entries):
+        now = time.time()
+        self.conn.executemany("INSERT OR REPLACE INTO solution_cache (canonical, solution, last_used) VALUES (?, ?, ?)",
+                              [(key, solution, now) for key, solution in entries])
+        # Evict the least recently used entries beyond max_entries
+        self.conn.execute("""
+            DELETE FROM solution_cache WHERE canonical IN (
+                SELECT canonical FROM solution_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            );
+        """, (self.max_entries,))
+        self.conn.commit()
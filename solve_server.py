@@ -0,0 +1,328 @@
+# Long-running solving service: a small HTTP/1.1 server on asyncio streams
+# (TCP or a Unix socket) in front of a pool of warm worker processes. Workers
+# import the solvers once at startup, so a request pays for neither
+# interpreter startup nor imports. Identical puzzles in flight at the same
+# time share one solve, and once max_pending distinct solves are queued new
+# ones are turned away with 503 until the backlog drains.
+#
+#   POST /solve    {"puzzle": "<board string>", "solver": "auto", "time_limit": 10}
+#   GET  /metrics  queue depth, request counts and latency percentiles
+#   GET  /health
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from portfolio import PORTFOLIO_MODES, portfolio_solve
+from results_store import ResultsStore
+from solver_registry import SOLVERS, get_solver, run_solver, supports
+from sudoku import SudokuBoard
+
+# Backends imported by every worker at startup
+WARM_SOLVERS = ("backtracking", "dlx")
+
+# Latencies kept for the metrics percentiles
+LATENCY_WINDOW = 1000
+
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+# Per-worker SolutionCache, opened by _warm_worker
+_cache = None
+
+
+def _warm_worker(solvers, cache_path):
+    global _cache
+    for name in solvers:
+        get_solver(name)
+    if cache_path:
+        from solution_cache import SolutionCache
+        _cache = SolutionCache(cache_path)
+
+
+def _solve_in_worker(board_string, solver, time_limit):
+    # Runs in a pool worker; returns (solution string or None, stats)
+    deadline = time.time() + time_limit if time_limit is not None else None
+    if solver in PORTFOLIO_MODES:
+        result, stats = portfolio_solve(board_string, deadline=deadline, mode=solver, cache=_cache)
+        stats = {"solver": stats["solver"], "solved": stats["solved"], "seconds": stats["seconds"]}
+    else:
+        result, stats = run_solver(solver, board_string, deadline)
+    solution = result.board_string if result is not None and stats["solved"] else None
+    return solution, stats
+
+
+def _percentile(values, q):
+    # Nearest-rank percentile, q in [0, 100]
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SolveServer:
+    """
+    Coalescing, backpressured front end for a ProcessPoolExecutor of warm
+    solver workers. Use start() / close() from a running event loop, or
+    serve_forever().
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, unix_path=None, workers=None, max_pending=64,
+                 time_limit=10.0, cache_path=None, db_path=None):
+        self.host, self.port, self.unix_path = host, port, unix_path
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.time_limit = time_limit
+        self.cache_path = cache_path
+        self.executor = self._new_executor()
+        self.store = ResultsStore(db_path) if db_path else None
+        self.server = None
+        # (board string, solver, time limit) -> future shared by every request for it
+        self.in_flight = {}
+        # One slot per worker; solves waiting for a slot make up the queue depth
+        self.slots = asyncio.Semaphore(self.workers)
+        self.running = 0
+        self.started = time.time()
+        self.counters = {"requests": 0, "solves": 0, "solved": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.solve_seconds = deque(maxlen=LATENCY_WINDOW)
+
+    def _new_executor(self):
+        # Spawned rather than forked: a pool rebuilt while connections are open
+        # must not inherit their sockets, or closing one would never reach the client
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_warm_worker, initargs=(WARM_SOLVERS, self.cache_path))
+
+    async def start(self):
+        # Start every worker now rather than on the first request
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, time.sleep, 0) for _ in range(self.workers)))
+        if self.unix_path:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=self.unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(cancel_futures=True)
+        if self.store is not None:
+            self.store.close()
+
+    async def serve_forever(self):
+        await self.start()
+        where = self.unix_path or f"http://{self.host}:{self.port}"
+        print(f"Serving on {where} with {self.workers} workers")
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    def metrics(self):
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "workers": self.workers,
+            "queue_depth": len(self.in_flight) - self.running,
+            "running": self.running,
+            "max_pending": self.max_pending,
+            **self.counters,
+            "latency": {f"p{q}": _percentile(self.latencies, q) for q in (50, 95, 99)},
+            "solve_seconds": {f"p{q}": _percentile(self.solve_seconds, q) for q in (50, 95, 99)},
+        }
+
+    async def solve(self, board_string, solver, time_limit):
+        # Join a solve already in flight for the same puzzle, or start one if there is room
+        key = (board_string, solver, time_limit)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future), True
+        if len(self.in_flight) >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPError(503, "too many puzzles queued, retry later")
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        asyncio.ensure_future(self._run_solve(key, future))
+        return await asyncio.shield(future), False
+
+    async def _run_solve(self, key, future):
+        board_string, solver, time_limit = key
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.slots:
+                self.running += 1
+                executor = self.executor
+                try:
+                    solution, stats = await loop.run_in_executor(executor, _solve_in_worker, board_string,
+                                                                 solver, time_limit)
+                except BrokenProcessPool:
+                    # A worker died and took the pool with it; later solves get a fresh one
+                    if self.executor is executor:
+                        self.executor = self._new_executor()
+                        executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                finally:
+                    self.running -= 1
+            self.counters["solves"] += 1
+            self.counters["solved"] += stats["solved"]
+            self.solve_seconds.append(stats["seconds"])
+            if self.store is not None and solution is not None:
+                self.store.record(None, board_string, stats["seconds"], solution=solution, solver=stats["solver"])
+            future.set_result((solution, stats))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            del self.in_flight[key]
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                self.counters["requests"] += 1
+                try:
+                    status, payload = await self._route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                if path == "/solve":
+                    self.latencies.append(time.perf_counter() - start)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        # (method, path, headers, body) or None at end of stream or after an error reply
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # Longer than the stream's line limit (64 KiB)
+            await self._write_response(writer, 413, {"error": "request line too long"}, False)
+            return None
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode('latin-1').split(" ", 2)
+        except ValueError:
+            await self._write_response(writer, 400, {"error": "malformed request line"}, False)
+            return None
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                await self._write_response(writer, 413, {"error": "header line too long"}, False)
+                return None
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._write_response(writer, 400, {"error": "Content-Length must be a non-negative integer"}, False)
+            return None
+        if length > MAX_BODY_BYTES:
+            await self._write_response(writer, 413, {"error": "request body too large"}, False)
+            return None
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path != "/solve":
+            raise HTTPError(404, f"no such endpoint {path}")
+        if method != "POST":
+            raise HTTPError(405, "POST a JSON body to /solve")
+
+        try:
+            request = json.loads(body or b"{}")
+            board = SudokuBoard(request["puzzle"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPError(400, f"expected {{\"puzzle\": \"<board string>\"}}: {e}")
+        board_string = board.board_string
+        solver = request.get("solver", "auto")
+        if not isinstance(solver, str):
+            raise HTTPError(400, "solver must be a string")
+        if solver not in PORTFOLIO_MODES and solver not in SOLVERS:
+            raise HTTPError(400, f"unknown solver '{solver}'")
+        if solver in SOLVERS and not supports(solver, board.size):
+            raise HTTPError(400, f"solver '{solver}' cannot solve {board.size}x{board.size} grids")
+        try:
+            time_limit = float(request.get("time_limit", self.time_limit))
+        except (TypeError, ValueError):
+            time_limit = math.nan
+        if not math.isfinite(time_limit) or time_limit <= 0:
+            raise HTTPError(400, "time_limit must be a positive number of seconds")
+
+        (solution, stats), coalesced = await self.solve(board_string, solver, time_limit)
+        return 200, {"puzzle": board_string, "solution": solution, **stats, "coalesced": coalesced}
+
+    async def _write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Sudoku solves over HTTP from warm worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="distinct puzzles queued or running before new ones get 503")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="default seconds allowed per solve")
+    parser.add_argument("--cache", default=None, help="answer repeats from a SolutionCache in this SQLite file")
+    parser.add_argument("--db", default=None, help="also record every solved puzzle in this SQLite results database")
+    args = parser.parse_args(argv)
+
+    server = SolveServer(args.host, args.port, args.unix, args.workers, args.max_pending, args.time_limit,
+                         args.cache, args.db)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# Solvers by name, stored as "module:function" strings and imported on first
+# use, so a process only pays for the backends it actually runs (the fuzzy
+# solver alone pulls in scikit-fuzzy, scipy and networkx).
+#
+# Each entry also records how the backend is called, so run_solver() can give
+# all of them one interface: (board, deadline) -> (SudokuBoard or None, stats).
+#   "exact":      fills a list-of-lists board in place and returns success
+#   "bounded":    like exact, and also takes deadline= (giving up returns False)
+#   "deadline":   takes deadline= and returns a SudokuBoard (possibly unsolved) or None
+#   "time_limit": takes time_limit= in seconds instead of an absolute deadline
+# The third field says whether the backend takes seed= for repeatable runs, and
+# the last one which grid sides it can solve.
+import importlib
+import time
+from sudoku import BOARD_SIZES, SudokuBoard
+
+NINE_ONLY = (9,)
+
+SOLVERS = {
+    "backtracking": ("backtracking_solver:solve_backtracking", "bounded", False, BOARD_SIZES),
+    "dlx": ("dlx_solver:solve_dlx", "exact", False, NINE_ONLY),
+    "genetic": ("genetic_algorithm:genetic_algorithm", "deadline", True, NINE_ONLY),
+    "vectorized_ga": ("gpu_genetic_algorithm:parallel_genetic_algorithm", "deadline", True, BOARD_SIZES),
+    "permutation_ga": ("gpu_genetic_algorithm:permutation_genetic_algorithm", "deadline", True, BOARD_SIZES),
+    "island_ga": ("island_model:island_genetic_algorithm", "deadline", True, BOARD_SIZES),
+    "fuzzy": ("fuzzy_logic:fuzzy_logic_solver", "deadline", False, NINE_ONLY),
+    "aco": ("ant_colony:ant_colony_optimization", "deadline", True, BOARD_SIZES),
+    "hybrid": ("hybrid_solver:parallel_hybrid_solver", "time_limit", True, NINE_ONLY),
+}
+
+# Exact solvers fill a list-of-lists board in place and return success; the
+# deadline of a bounded one is optional
+EXACT_SOLVERS = tuple(name for name, (_, kind, _, _) in SOLVERS.items() if kind in ("exact", "bounded"))
+
+_loaded = {}
+
+
+def register_solver(name, target, kind, seeded=False, sizes=BOARD_SIZES):
+    # Add or replace a backend; target is "module:function"
+    if kind not in ("exact", "bounded", "deadline", "time_limit"):
+        raise ValueError(f"Unknown solver kind '{kind}'")
+    SOLVERS[name] = (target, kind, seeded, tuple(sizes))
+    _loaded.pop(name, None)
+
+
+def get_solver(name):
+    solver = _loaded.get(name)
+    if solver is None:
+        if name not in SOLVERS:
+            raise KeyError(f"Unknown solver '{name}'. Available: {', '.join(SOLVERS)}")
+        module_name, function_name = SOLVERS[name][0].split(":")
+        solver = getattr(importlib.import_module(module_name), function_name)
+        _loaded[name] = solver
+    return solver
+
+
+def supports(name, size):
+    # Whether a registered backend can solve a size x size grid
+    return size in SOLVERS[name][3]
+
+
+def run_solver(name, board, deadline=None, seed=None):
+    # Run one backend on a copy of board (SudokuBoard, string or list of lists).
+    # Returns (SudokuBoard or None, stats); the board may be unsolved for heuristic backends.
+    # seed only reaches backends that take one.
+    board = SudokuBoard(board)
+    if name in SOLVERS and not supports(name, board.size):
+        raise ValueError(f"Solver '{name}' only handles {', '.join(f'{n}x{n}' for n in SOLVERS[name][3])} "
+                         f"grids, not {board.size}x{board.size}")
+    solver = get_solver(name)
+    _, kind, seeded, _ = SOLVERS[name]
+    options = {"seed": seed} if seeded and seed is not None else {}
+    start = time.perf_counter()
+    if kind == "exact":
+        grid = board.get_board()
+        result = SudokuBoard(grid) if solver(grid) else None
+    elif kind == "bounded":
+        grid = board.get_board()
+        result = SudokuBoard(grid) if solver(grid, deadline=deadline) else None
+    elif kind == "time_limit":
+        time_limit = None if deadline is None else max(deadline - time.time(), 0)
+        result = solver(board, time_limit=time_limit, **options)
+    else:
+        result = solver(board, deadline=deadline, **options)
+    stats = {
+        "solver": name,
+        "seconds": time.perf_counter() - start,
+        "solved": result is not None and result.is_solved(),
+    }
+    return result, stats
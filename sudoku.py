@@ -1,62 +1,144 @@
+from units import geometry, size_of_cells
+
+# One character per cell: '1'-'9' then 'A'-'Z' for 10 and up, so a 16x16 board
+# uses 1-9A-G and a 25x25 board 1-9A-P. '0' and '.' are blanks; letters may be lower case.
+ALPHABET = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Translate between the characters of a board string and cell values; any other
+# character becomes _BAD_CELL so the parse can reject it
+_BAD_CELL = 255
+_CELL_VALUES = bytes({ord(char): value for value, chars in enumerate(["0."] + [c + c.lower() for c in ALPHABET])
+                      for char in chars}.get(byte, _BAD_CELL) for byte in range(256))
+_CELL_CHARS = bytes.maketrans(bytes(range(len(ALPHABET) + 1)), b'0' + ALPHABET.encode())
+
+# Grid sides a board can have; boxes are square, so the side is a square number
+BOARD_SIZES = (4, 9, 16, 25)
+
+
 class SudokuBoard:
-    def __init__(self, board_string):
-        self.board = self.parse_board(board_string)
+    """
+    A board stored as one bytearray of cells (0 for blank), row by row.
+    Accepts a board string, a list of lists, raw bytes or another SudokuBoard.
+    The side (9, 16 or 25) is taken from the number of cells unless size is given.
+    Raises ValueError for a wrong cell count, an unknown character or a cell
+    above the side.
+    """
+
+    __slots__ = ("cells", "geometry")
+
+    def __init__(self, board, size=None):
+        if isinstance(board, SudokuBoard):
+            self.cells = bytearray(board.cells)
+            size = board.geometry.size
+        elif isinstance(board, str):
+            self.cells = self.parse_board(board)
+        elif isinstance(board, (bytes, bytearray, memoryview)):
+            self.cells = bytearray(board)
+        else:
+            self.cells = bytearray(num for row in board for num in row)
+        if size is None:
+            size = size_of_cells(len(self.cells))
+            if size * size != len(self.cells) or size not in BOARD_SIZES:
+                raise ValueError(f"A board needs 16, 81, 256 or 625 cells, got {len(self.cells)}")
+        elif len(self.cells) != size * size:
+            raise ValueError(f"A {size}x{size} board needs {size * size} cells, got {len(self.cells)}")
+        if max(self.cells) > size:
+            raise ValueError(f"Cells of a {size}x{size} board must be 0-{size}, got {max(self.cells)}")
+        self.geometry = geometry(size)
 
     def parse_board(self, board_string):
-        board = []
-        row = []
-        for i, char in enumerate(board_string):
-            if char == '0':
-                row.append(0)
-            else:
-                row.append(int(char))
-            if (i + 1) % 9 == 0:
-                board.append(row)
-                row = []
+        cells = bytearray(board_string.encode('ascii').translate(_CELL_VALUES))
+        if _BAD_CELL in cells:
+            raise ValueError(f"Board strings use 0 or . for blanks and {ALPHABET[0]}-{ALPHABET[-1]} for digits")
+        return cells
+
+    @property
+    def size(self):
+        return self.geometry.size
+
+    def copy(self):
+        board = SudokuBoard.__new__(SudokuBoard)
+        board.cells = bytearray(self.cells)
+        board.geometry = self.geometry
         return board
 
-    def is_valid(self, row, col, num):
-        # Check row
-        for i in range(9):
-            if self.board[row][i] == num:
-                return False
+    def get(self, row, col):
+        return self.cells[row * self.geometry.size + col]
 
-        # Check column
-        for i in range(9):
-            if self.board[i][col] == num:
-                return False
+    def set(self, row, col, num):
+        self.cells[row * self.geometry.size + col] = num
 
-        # Check 3x3 box
-        start_row = row - row % 3
-        start_col = col - col % 3
-        for i in range(3):
-            for j in range(3):
-                if self.board[start_row + i][start_col + j] == num:
-                    return False
+    # Zero-copy views into the cell buffer
+    def row(self, row):
+        size = self.geometry.size
+        return memoryview(self.cells)[row * size:row * size + size]
 
-        return True
+    def col(self, col):
+        return memoryview(self.cells)[col::self.geometry.size]
+
+    def box(self, box):
+        # A box is not contiguous, so it comes back as its row segments
+        size, order = self.geometry.size, self.geometry.order
+        start = self.geometry.box_units[box][0]
+        view = memoryview(self.cells)
+        return tuple(view[start + i * size:start + i * size + order] for i in range(order))
+
+    def is_valid(self, row, col, num):
+        # num must not already sit in the cell or anywhere in its row, column or box
+        index = row * self.geometry.size + col
+        return self.cells[index] != num and num not in self.geometry.peer_getters[index](self.cells)
 
     def print_board(self):
-        for i in range(9):
-            if i % 3 == 0 and i != 0:
-                print("- - - - - - - - - - - - ")
+        size, order = self.geometry.size, self.geometry.order
+        for i in range(size):
+            if i % order == 0 and i != 0:
+                print("- " * (size + order))
 
-            for j in range(9):
-                if j % 3 == 0 and j != 0:
+            for j in range(size):
+                if j % order == 0 and j != 0:
                     print(" | ", end="")
 
-                print(self.board[i][j], end=" ")
+                num = self.cells[i * size + j]
+                print(num if size == 9 else ALPHABET[num - 1] if num else ".", end=" ")
 
             print()
 
     def is_solved(self):
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    return False
-                if not self.is_valid(i, j, self.board[i][j]):
-                    return False
+        cells = self.cells
+        peer_getters = self.geometry.peer_getters
+        for index, num in enumerate(cells):
+            if num == 0 or num in peer_getters[index](cells):
+                return False
         return True
 
     def get_board(self):
-        return self.board
+        # A list-of-lists copy; write through set() to change the board
+        size = self.geometry.size
+        return [list(self.cells[i * size:i * size + size]) for i in range(size)]
+
+    @property
+    def board_string(self):
+        return bytes(self.cells).translate(_CELL_CHARS).decode('ascii')
+
+    def __reduce__(self):
+        # Pickle as cells and side only; the geometry is shared per process
+        return SudokuBoard, (bytes(self.cells), self.geometry.size)
+
+    def __eq__(self, other):
+        return isinstance(other, SudokuBoard) and self.cells == other.cells
+
+
+def flat_cells(board):
+    # The cell values of a SudokuBoard, flat bytes or a list of lists, row by row
+    if isinstance(board, SudokuBoard):
+        return board.cells
+    if isinstance(board, (bytes, bytearray)):
+        return board
+    return [num for row in board for num in row]
+
+
+def board_size(board):
+    # Side of a SudokuBoard or a square list of lists
+    if isinstance(board, SudokuBoard):
+        return board.geometry.size
+    return len(board)
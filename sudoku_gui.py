@@ -1,11 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import json
+import queue
+import threading
 import time
-import sqlite3
+import instrumentation
 from sudoku import SudokuBoard
-from backtracking_solver import solve_backtracking
-from hybrid_solver import parallel_hybrid_solver
+from portfolio import PORTFOLIO_MODES, portfolio_solve
+from solver_registry import SOLVERS, run_solver
+from solution_cache import SolutionCache
+from results_store import ResultsStore
+
+# Portfolio choices and outcomes, shared with main.py
+PORTFOLIO_LOG = "portfolio_log.jsonl"
+
+# How often the Tk loop drains the solve worker's messages (about 30 frames per second)
+POLL_MS = 30
+
+GIVEN_FG = "#333"
+FILLED_FG = "#2a4d69"
 
 JSON_PATH = "sudoku_boards.json"
 
@@ -13,24 +26,6 @@ JSON_PATH = "sudoku_boards.json"
 with open(JSON_PATH, 'r') as f:
     PUZZLES = json.load(f)
 
-def save_result_to_db(puzzle_id, puzzle_string, time_taken):
-    conn = sqlite3.connect("sudoku_results.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS solve_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            puzzle_id INTEGER,
-            puzzle_string TEXT NOT NULL,
-            time_taken REAL NOT NULL
-        );
-    """)
-    cursor.execute(
-        "INSERT INTO solve_results (puzzle_id, puzzle_string, time_taken) VALUES (?, ?, ?)",
-        (puzzle_id, puzzle_string, "{:.3f}".format(time_taken))
-    )
-    conn.commit()
-    conn.close()
-
 class SudokuApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -38,10 +33,22 @@ class SudokuApp(tk.Tk):
         self.geometry("700x600")
         self.configure(bg="#f4f4f4")
         self.selected_index = tk.StringVar(value="ID 0")
+        self.solver_name = tk.StringVar(value="auto")
         self.solved_board = None
         self.time_taken = None
+        self.cache = SolutionCache()
+        # One connection for the app's lifetime; rows are written in the background
+        self.results = ResultsStore()
+        # Solves run on a worker thread that only talks to the UI through this queue
+        self.messages = queue.Queue()
+        self.worker = None
+        self.cancel_event = None
+        self.solve_started = None
+        self.givens = None
         self.create_widgets()
+        self.build_grid()
         self.display_board(PUZZLES[0]['board'])
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def create_widgets(self):
         # Title
@@ -56,9 +63,16 @@ class SudokuApp(tk.Tk):
         self.puzzle_menu.current(0)
         self.puzzle_menu.pack(side=tk.LEFT, padx=5)
         self.puzzle_menu.bind("<<ComboboxSelected>>", self.on_select)
-        # Solve button
+        # Solver selector
+        self.solver_menu = ttk.Combobox(selector_frame, state="readonly", width=14,
+            values=list(PORTFOLIO_MODES) + list(SOLVERS),
+            textvariable=self.solver_name)
+        self.solver_menu.pack(side=tk.LEFT, padx=5)
+        # Solve and Cancel buttons
         self.solve_btn = ttk.Button(selector_frame, text="Solve", command=self.solve)
         self.solve_btn.pack(side=tk.LEFT, padx=10)
+        self.cancel_btn = ttk.Button(selector_frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT)
         # Time label
         self.time_label = tk.Label(selector_frame, text="", font=("Helvetica", 12), bg="#f4f4f4", fg="#2a4d69")
         self.time_label.pack(side=tk.LEFT, padx=10)
@@ -69,14 +83,12 @@ class SudokuApp(tk.Tk):
         self.status_label = tk.Label(self, text="", font=("Helvetica", 12), bg="#f4f4f4", fg="#c0392b")
         self.status_label.pack(pady=5)
 
-    def display_board(self, board, solved=False):
-        for widget in self.board_frame.winfo_children():
-            widget.destroy()
+    def build_grid(self):
+        # The 81 labels are created once; display_board only changes their text
+        self.cell_labels = []
         for r in range(9):
             for c in range(9):
-                val = board[r][c]
                 cell_bg = "#eaf6ff" if (r//3+c//3)%2==0 else "#f9f9f9"
-                fg = "#333" if val != 0 else "#bbb"
                 font = ("Consolas", 16)
                 padx = 2
                 pady = 2
@@ -84,45 +96,145 @@ class SudokuApp(tk.Tk):
                     padx = (10, 2)  # extra space before col 3 and 6
                 if r in [3, 6]:
                     pady = (10, 2)  # extra space before row 3 and 6
-                cell = tk.Label(self.board_frame, text=str(val) if val != 0 else '', width=3, height=2, font=font, bg=cell_bg, fg=fg, relief="ridge", borderwidth=2)
+                cell = tk.Label(self.board_frame, text='', width=3, height=2, font=font, bg=cell_bg, fg=GIVEN_FG, relief="ridge", borderwidth=2)
                 cell.grid(row=r, column=c, padx=padx, pady=pady)
+                self.cell_labels.append(cell)
+        self.shown = bytearray(81)
+        self.shown_given = [True] * 81
+
+    def display_board(self, board, solved=False):
+        # board: list of lists, SudokuBoard or 81 cell values. Only cells whose
+        # value or given/filled colour changed are reconfigured, so redrawing a
+        # progress board is cheap.
+        cells = SudokuBoard(board).cells
+        givens = self.givens if self.givens is not None else cells
+        for index, val in enumerate(cells):
+            given = givens[index] != 0
+            if val != self.shown[index] or given != self.shown_given[index]:
+                fg = GIVEN_FG if given else FILLED_FG
+                self.cell_labels[index].config(text=str(val) if val != 0 else '', fg=fg)
+                self.shown_given[index] = given
+        self.shown[:] = cells
 
     def on_select(self, event=None):
         idx = self.puzzle_menu.current()
         self.solved_board = None
+        self.givens = None
         self.time_label.config(text="")
         self.status_label.config(text="")
         self.display_board(PUZZLES[idx]['board'])
 
     def solve(self):
+        if self.worker is not None:
+            return
         idx = self.puzzle_menu.current()
-        board = [row[:] for row in PUZZLES[idx]['board']]
+        board = PUZZLES[idx]['board']
+        self.givens = None
+        self.display_board(board)
+        self.givens = SudokuBoard(board).cells
         self.status_label.config(text="Solving...")
-        self.update()
-        start = time.time()
-        solved = False
-        if solve_backtracking(board):
-            solved = True
-        else:
-            # Try hybrid
-            result = parallel_hybrid_solver("".join([str(x) for row in PUZZLES[idx]['board'] for x in row]))
-            if result:
-                board = [list(map(int, list(result.board_string[i:i+9]))) for i in range(0,81,9)]
-                solved = True
-        elapsed = time.time() - start
-        if solved:
+        self.time_label.config(text="")
+        self.solve_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.puzzle_menu.config(state=tk.DISABLED)
+        self.solver_menu.config(state=tk.DISABLED)
+        self.cancel_event = threading.Event()
+        self.solve_started = time.time()
+        self.worker = threading.Thread(target=self.solve_worker, args=(board, self.solver_name.get(), self.cancel_event),
+                                       daemon=True)
+        self.worker.start()
+        self.after(POLL_MS, self.poll_worker)
+
+    def solve_worker(self, board, solver_name, cancel_event):
+        # Runs on the worker thread: never touches Tk, only puts messages on the queue
+        def on_best(stage, fitness, cells):
+            self.messages.put(("progress", stage, fitness, cells))
+        try:
+            with instrumentation.recording(count_is_valid=False, listener=on_best,
+                                           cancel_event=cancel_event) as recorder:
+                if solver_name in PORTFOLIO_MODES:
+                    result, stats = portfolio_solve(board, mode=solver_name, log_path=PORTFOLIO_LOG, cache=self.cache)
+                else:
+                    result, stats = run_solver(solver_name, board)
+            stats["iterations"], stats["nodes"] = recorder.solve_counts()
+            self.messages.put(("done", result, stats))
+        except instrumentation.Cancelled:
+            self.messages.put(("cancelled",))
+        except Exception as e:
+            self.messages.put(("error", f"{type(e).__name__}: {e}"))
+
+    def poll_worker(self):
+        # Drain everything the worker sent since the last poll; of the progress
+        # boards only the newest one is drawn
+        progress = None
+        finished = None
+        while finished is None:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                progress = message
+            else:
+                finished = message
+        if finished is not None:
+            self.finish_solve(finished)
+            return
+        if progress is not None:
+            _, stage, fitness, cells = progress
+            self.display_board(cells)
+            self.status_label.config(text=f"Solving... {stage} best fitness {fitness}")
+        self.time_label.config(text=f"{time.time() - self.solve_started:.1f} s")
+        self.after(POLL_MS, self.poll_worker)
+
+    def finish_solve(self, message):
+        elapsed = time.time() - self.solve_started
+        self.worker = None
+        self.solve_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.puzzle_menu.config(state="readonly")
+        self.solver_menu.config(state="readonly")
+        if message[0] == "cancelled":
+            self.status_label.config(text="Cancelled.")
+            self.time_label.config(text="")
+            return
+        if message[0] == "error":
+            self.status_label.config(text="Solver failed.")
+            self.time_label.config(text="")
+            messagebox.showerror("Solver error", message[1])
+            return
+        _, result, stats = message
+        if stats["solved"]:
+            board = result.get_board()
             self.solved_board = board
             self.display_board(board, solved=True)
             self.time_label.config(text=f"Solved in {elapsed:.3f} s")
-            self.status_label.config(text="Solved!")
+            self.status_label.config(text=f"Solved! ({stats['solver']})")
             # Save to database
+            idx = self.puzzle_menu.current()
             puzzle_id = PUZZLES[idx]['id']
-            puzzle_string = "".join([str(x) for row in PUZZLES[idx]['board'] for x in row])
-            save_result_to_db(puzzle_id, puzzle_string, elapsed)
+            puzzle_string = SudokuBoard(PUZZLES[idx]['board']).board_string
+            self.results.record(puzzle_id, puzzle_string, elapsed, solution=result.board_string,
+                                solver=stats["solver"], iterations=stats.get("iterations"), nodes=stats.get("nodes"))
         else:
+            if result is not None:
+                self.display_board(result)
             self.status_label.config(text="No solution found.")
             self.time_label.config(text="")
 
+    def cancel(self):
+        # The solve stops at the next instrumentation hook it reaches
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_label.config(text="Cancelling...")
+            self.cancel_btn.config(state=tk.DISABLED)
+
+    def on_close(self):
+        self.cancel()
+        self.destroy()
+
 if __name__ == "__main__":
     app = SudokuApp()
-    app.mainloop() 
\ No newline at end of file
+    app.mainloop()
+    app.results.close()
+    app.cache.close() 
\ No newline at end of file
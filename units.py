@@ -0,0 +1,110 @@
+# Index tables for a Sudoku grid, built once per grid size and shared by every
+# solver. A grid of order n has side n * n (9, 16, 25) and n ** 4 cells,
+# numbered row by row; units 0..side-1 are the rows, then the columns, then
+# the boxes. The module-level names below are the tables of the 9x9 grid.
+from functools import lru_cache
+from math import isqrt
+from operator import itemgetter
+
+
+class Geometry:
+    """Index tables for one grid size; the NumPy gather arrays are built on first access."""
+
+    # NumPy gather-index arrays and the tuples they are built from
+    _INDEX_SOURCES = {
+        "unit_index": "units",
+        "peer_index": "peers",
+        "cell_unit_index": "cell_units",
+    }
+
+    def __init__(self, size):
+        order = isqrt(size)
+        if order < 2 or order * order != size:
+            raise ValueError(f"Grid side must be a square number of at least 4, got {size}")
+        self.order = order
+        self.size = size
+        self.cells = size * size
+        cells = range(self.cells)
+        self.row_of = tuple(i // size for i in cells)
+        self.col_of = tuple(i % size for i in cells)
+        self.box_of = tuple((i // (size * order)) * order + (i % size) // order for i in cells)
+
+        self.row_units = tuple(tuple(r * size + c for c in range(size)) for r in range(size))
+        self.col_units = tuple(tuple(r * size + c for r in range(size)) for c in range(size))
+        self.box_units = tuple(tuple((br * order + i) * size + bc * order + j for i in range(order) for j in range(order))
+                               for br in range(order) for bc in range(order))
+        self.units = self.row_units + self.col_units + self.box_units
+
+        # The three unit numbers (row, column, box) each cell belongs to
+        self.cell_units = tuple((self.row_of[i], size + self.col_of[i], 2 * size + self.box_of[i]) for i in cells)
+
+        # The other cells sharing a row, column or box with each cell (20 on a 9x9 grid)
+        self.peers = tuple(tuple(sorted(set(self.row_units[self.row_of[i]] + self.col_units[self.col_of[i]]
+                                            + self.box_units[self.box_of[i]]) - {i}))
+                           for i in cells)
+
+        # itemgetters that pull a unit's or a cell's peers' values out of a flat cell sequence in one C call
+        self.unit_getters = tuple(itemgetter(*unit) for unit in self.units)
+        self.peer_getters = tuple(itemgetter(*peers) for peers in self.peers)
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set yet: the lazy NumPy arrays
+        if name not in Geometry._INDEX_SOURCES:
+            raise AttributeError(f"'Geometry' object has no attribute {name!r}")
+        import numpy as np
+        value = np.array(getattr(self, Geometry._INDEX_SOURCES[name]), dtype=np.intp)
+        setattr(self, name, value)
+        return value
+
+
+@lru_cache(maxsize=None)
+def geometry(size=9):
+    return Geometry(size)
+
+
+def size_of_cells(count):
+    # Grid side for a flat board of `count` cells
+    return isqrt(count)
+
+
+_NINE = geometry(9)
+
+ROW_OF = _NINE.row_of
+COL_OF = _NINE.col_of
+BOX_OF = _NINE.box_of
+
+ROW_UNITS = _NINE.row_units
+COL_UNITS = _NINE.col_units
+BOX_UNITS = _NINE.box_units
+UNITS = _NINE.units
+
+CELL_UNITS = _NINE.cell_units
+PEERS = _NINE.peers
+
+UNIT_GETTERS = _NINE.unit_getters
+PEER_GETTERS = _NINE.peer_getters
+
+# Gather-index arrays for batched NumPy work on (n, 81) boards. They are built
+# on first access, so modules that only need the tuples never import NumPy.
+_INDEX_SOURCES = {
+    "UNIT_INDEX": "unit_index",
+    "PEER_INDEX": "peer_index",
+    "CELL_UNIT_INDEX": "cell_unit_index",
+}
+
+
+def __getattr__(name):
+    if name not in _INDEX_SOURCES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(_NINE, _INDEX_SOURCES[name])
+    globals()[name] = value
+    return value
+
+
+def count_violations(cells):
+    # Repeated non-zero digits summed over all units of a flat cell sequence (any grid size)
+    violations = 0
+    for getter in geometry(size_of_cells(len(cells))).unit_getters:
+        values = [num for num in getter(cells) if num]
+        violations += len(values) - len(set(values))
+    return violations